@@ -2,21 +2,24 @@ import gradio as gr
 from sidekick import Sidekick
 
 
-async def setup():
-    sidekick = Sidekick()
+async def setup(sidekick_id):
+    sidekick = Sidekick(sidekick_id)
     await sidekick.setup()
-    return sidekick
+    return sidekick, sidekick.sidekick_id, await sidekick.get_history()
 
 
 async def process_message(sidekick, message, success_criteria, history):
-    results = await sidekick.run_superstep(message, success_criteria, history)
-    return results, sidekick
+    async for results in sidekick.stream_superstep(message, success_criteria, history):
+        yield results, sidekick
 
 
-async def reset():
+async def reset(sidekick):
+    if sidekick:
+        await sidekick.memory.adelete_thread(sidekick.sidekick_id)
+        free_resources(sidekick)
     new_sidekick = Sidekick()
     await new_sidekick.setup()
-    return "", "", None, new_sidekick
+    return "", "", None, new_sidekick, new_sidekick.sidekick_id
 
 
 def free_resources(sidekick):
@@ -31,6 +34,8 @@ def free_resources(sidekick):
 with gr.Blocks(title="Sidekick", theme=gr.themes.Default(primary_hue="emerald")) as ui:
     gr.Markdown("## Sidekick Personal Co-Worker")
     sidekick = gr.State(delete_callback=free_resources)
+    # Kept in the browser, so a returning user picks up their conversation, even after a restart
+    sidekick_id = gr.BrowserState(None, storage_key="sidekick_id")
 
     with gr.Row():
         chatbot = gr.Chatbot(label="Sidekick", height=300, type="messages")
@@ -45,7 +50,7 @@ with gr.Blocks(title="Sidekick", theme=gr.themes.Default(primary_hue="emerald"))
         reset_button = gr.Button("Reset", variant="stop")
         go_button = gr.Button("Go!", variant="primary")
 
-    ui.load(setup, [], [sidekick])
+    ui.load(setup, [sidekick_id], [sidekick, sidekick_id, chatbot])
     message.submit(
         process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick]
     )
@@ -55,7 +60,7 @@ with gr.Blocks(title="Sidekick", theme=gr.themes.Default(primary_hue="emerald"))
     go_button.click(
         process_message, [sidekick, message, success_criteria, chatbot], [chatbot, sidekick]
     )
-    reset_button.click(reset, [], [message, success_criteria, chatbot, sidekick])
+    reset_button.click(reset, [sidekick], [message, success_criteria, chatbot, sidekick, sidekick_id])
 
 
 ui.launch(inbrowser=True)
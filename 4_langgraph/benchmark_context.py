@@ -0,0 +1,75 @@
+"""
+Compare the tokens the Sidekick's worker is sent over a long browsing task, with and without
+compacting the conversation.
+
+A synthetic task visits pages and extracts their text, as the Playwright tools do, one tool call
+per turn. Pages of the same site share their navigation and footer, and some pages are visited
+twice. For each task length it prints the tokens of the worker's last call and of all its calls,
+sending the full conversation as before and the compacted one. The longest tasks go over the
+compactor's token budget, so their earliest steps are left out too.
+No model is called; tokens are estimated at 4 characters each.
+
+Run from the 4_langgraph directory with: uv run benchmark_context.py
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from sidekick_context import ContextCompactor, estimate_tokens
+import random
+
+TASK_LENGTHS = [5, 10, 20, 40, 80, 160]
+PAGES = 100
+SENTENCES_PER_PAGE = 120
+BOILERPLATE = " ".join(
+    f"Navigation link {n} to another section of the example site, with its menu and search box." for n in range(30)
+)
+
+
+def make_page(number: int, rng: random.Random) -> str:
+    sentences = [
+        f"Page {number} paragraph {n} reports figure {rng.randint(1000, 9999)} about the topic in some detail."
+        for n in range(SENTENCES_PER_PAGE)
+    ]
+    return f"{BOILERPLATE} {' '.join(sentences)} {BOILERPLATE}"
+
+
+def run_task(turns: int, compactor: ContextCompactor | None, seed: int = 0) -> tuple[int, int]:
+    """Play the task turn by turn, returning the tokens of the last worker call and of all of them"""
+    rng = random.Random(seed)
+    pages = [make_page(number, rng) for number in range(PAGES)]
+    messages = [
+        SystemMessage(content="You are a helpful assistant that can use tools to complete tasks. " * 20),
+        HumanMessage(content="Research the topic across the site and summarize the figures."),
+    ]
+    last, total = 0, 0
+    for turn in range(turns):
+        sent = compactor.compact(messages) if compactor else messages
+        last = estimate_tokens(sent)
+        total += last
+        page = rng.randrange(PAGES)
+        call = {"name": "extract_text", "args": {"url": f"https://example.com/{page}"}, "id": f"call_{turn}"}
+        messages += [
+            AIMessage(content="", tool_calls=[call]),
+            ToolMessage(content=pages[page], tool_call_id=call["id"]),
+        ]
+    return last, total
+
+
+def main():
+    print(f"{'Turns':>6} {'Last call full':>15} {'compacted':>10} {'All calls full':>15} {'compacted':>10} {'Saved':>7}")
+    for turns in TASK_LENGTHS:
+        last_full, total_full = run_task(turns, None)
+        compactor = ContextCompactor()
+        last, total = run_task(turns, compactor)
+        print(
+            f"{turns:>6} {last_full:>15,} {last:>10,} {total_full:>15,} {total:>10,} "
+            f"{1 - total / total_full:>7.1%}"
+        )
+    stats = compactor.get_stats()
+    print(
+        f"Longest task: {stats['calls']} calls sent {stats['tokens_sent']:,} of {stats['tokens_before']:,} tokens, "
+        f"within a budget of {compactor.token_budget:,} per call"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark concurrent Sidekick sessions sharing one event loop, as they do in the Gradio app.
+
+Each session runs one superstep: the worker calls a tool, then answers, and the evaluator accepts
+the answer, so three model calls. The model is the mock server from 6_mcp/mock_llm.py, started
+here with a script and a fixed latency per call, so no API calls are made. With the graph nodes
+awaiting the model, sessions overlap and throughput grows with the number of sessions.
+
+Checkpoints go to a temporary database rather than memory.db.
+
+Run from the 4_langgraph directory with: uv run benchmark_sidekick.py
+"""
+
+from langchain_core.tools import tool
+from sidekick import Sidekick
+import sidekick_memory
+import asyncio
+import httpx
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PORT = 8767
+LATENCY_MS = 300
+TOOL_LATENCY_MS = 50
+SESSIONS = [1, 2, 4, 8, 16, 32]
+MOCK_LLM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "6_mcp", "mock_llm.py")
+
+SCRIPT = [
+    {
+        "match": "You are an evaluator",
+        "steps": [{"content": json.dumps({"feedback": "Looks good", "success_criteria_met": True, "user_input_needed": False})}],
+    },
+    {
+        "match": "You are a helpful assistant",
+        "steps": [
+            {"tool_calls": [{"name": "lookup", "arguments": {"query": "benchmark"}}]},
+            {"content": "Here is the answer to your question, based on what I looked up."},
+        ],
+    },
+]
+
+
+@tool
+async def lookup(query: str) -> str:
+    """Look up information about the query."""
+    await asyncio.sleep(TOOL_LATENCY_MS / 1000)
+    return f"Information about {query}"
+
+
+def start_mock_server(script_file: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MOCK_LLM_PORT": str(PORT),
+        "MOCK_LLM_LATENCY_MS": str(LATENCY_MS),
+        "MOCK_LLM_SCRIPT": script_file,
+    }
+    server = subprocess.Popen([sys.executable, MOCK_LLM], env=env)
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/v1/models").raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("The mock model server did not start")
+
+
+async def run_session(sidekick: Sidekick) -> int:
+    """Run one streamed superstep, returning the number of updates streamed to the UI"""
+    updates = 0
+    async for _ in sidekick.stream_superstep("What is the answer?", "A clear answer", []):
+        updates += 1
+    return updates
+
+
+async def run_sessions(count: int) -> tuple[float, int, int]:
+    sidekicks = [Sidekick() for _ in range(count)]
+    for sidekick in sidekicks:
+        await sidekick.setup(tools=[lookup])
+    started = time.perf_counter()
+    updates = await asyncio.gather(*[run_session(sidekick) for sidekick in sidekicks])
+    tokens_sent = sum(sidekick.context.get_stats()["tokens_sent"] for sidekick in sidekicks)
+    return time.perf_counter() - started, sum(updates), tokens_sent
+
+
+async def main():
+    # Set after importing sidekick, whose load_dotenv would otherwise replace them
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+    os.environ["OPENAI_API_KEY"] = "mock"
+    tmp = tempfile.mkdtemp()
+    sidekick_memory.SIDEKICK_DB = os.path.join(tmp, "checkpoints.db")
+    script_file = os.path.join(tmp, "script.json")
+    with open(script_file, "w") as f:
+        json.dump(SCRIPT, f)
+    server = start_mock_server(script_file)
+    try:
+        await run_sessions(1)
+        print(f"Model latency {LATENCY_MS}ms per call, 3 calls and 1 tool call per session")
+        baseline = None
+        for count in SESSIONS:
+            elapsed, updates, tokens_sent = await run_sessions(count)
+            rate = count / elapsed
+            baseline = baseline or rate
+            print(
+                f"  {count:>3} sessions: {elapsed:6.2f}s, {rate:6.2f} sessions/sec "
+                f"({rate / baseline:5.1f}x), {updates} streamed updates, {tokens_sent:,} context tokens"
+            )
+    finally:
+        await sidekick_memory.close_checkpointer()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
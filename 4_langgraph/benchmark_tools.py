@@ -0,0 +1,81 @@
+"""
+Benchmark the Sidekick's tool node when the worker asks for several searches at once.
+
+Each session runs a few steps, and in each step the worker calls the search and Wikipedia tools
+several times in one message, with queries that sessions often repeat. The tools are stand-ins
+that block for a fixed time, like the Serper and Wikipedia clients, so nothing is called online.
+It compares running the tools as plain blocking functions, as before, with the pooled and
+cached tools from sidekick_tools.
+
+Run from the 4_langgraph directory with: uv run benchmark_tools.py
+"""
+
+from langchain.agents import Tool
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import ToolNode
+from sidekick_tools import ToolCache, pooled
+import asyncio
+import random
+import time
+
+TOOL_LATENCY_MS = 400
+SESSIONS = 8
+STEPS = 3
+CALLS_PER_STEP = 4
+QUERIES = 12
+
+
+def search(query: str) -> str:
+    time.sleep(TOOL_LATENCY_MS / 1000)
+    return f"Search results for {query}"
+
+
+def lookup(query: str) -> str:
+    time.sleep(TOOL_LATENCY_MS / 1000)
+    return f"Wikipedia article about {query}"
+
+
+def make_tools(cache: ToolCache | None) -> list[Tool]:
+    if cache is None:
+        return [
+            Tool(name="search", func=search, description="Search the web"),
+            Tool(name="wikipedia", func=lookup, description="Look up Wikipedia"),
+        ]
+    return [
+        Tool(name="search", func=search, coroutine=cache.wrap("search", pooled(search)), description="Search the web"),
+        Tool(name="wikipedia", func=lookup, coroutine=cache.wrap("wikipedia", pooled(lookup)), description="Look up Wikipedia"),
+    ]
+
+
+async def run_session(node: ToolNode, rng: random.Random) -> None:
+    for step in range(STEPS):
+        calls = [
+            {"name": rng.choice(["search", "wikipedia"]), "args": {"__arg1": f"topic {rng.randrange(QUERIES)}"}, "id": f"call_{step}_{n}"}
+            for n in range(CALLS_PER_STEP)
+        ]
+        await node.ainvoke({"messages": [AIMessage(content="", tool_calls=calls)]})
+
+
+async def run(cache: ToolCache | None) -> float:
+    node = ToolNode(tools=make_tools(cache))
+    started = time.perf_counter()
+    await asyncio.gather(*[run_session(node, random.Random(seed)) for seed in range(SESSIONS)])
+    return time.perf_counter() - started
+
+
+async def main():
+    calls = SESSIONS * STEPS * CALLS_PER_STEP
+    print(f"{SESSIONS} sessions, {STEPS} steps of {CALLS_PER_STEP} tool calls each, {TOOL_LATENCY_MS}ms per call")
+    blocking = await run(None)
+    print(f"  Blocking tools:        {blocking:5.2f}s, {calls / blocking:6.1f} calls/sec")
+    cache = ToolCache()
+    cached = await run(cache)
+    stats = cache.get_stats()
+    print(
+        f"  Pooled, cached tools:  {cached:5.2f}s, {calls / cached:6.1f} calls/sec "
+        f"({blocking / cached:.1f}x), {stats['misses']} tool runs, hit rate {stats['hit_rate']:.0%}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,201 @@
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
+from dotenv import load_dotenv
+import asyncio
+import os
+import time
+
+load_dotenv(override=True)
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").strip().lower() == "true"
+BROWSER_WARM_SPARES = int(os.getenv("BROWSER_WARM_SPARES", "2"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "5"))
+BROWSER_IDLE_MINUTES = float(os.getenv("BROWSER_IDLE_MINUTES", "30"))
+REAP_EVERY_SECONDS = 60
+
+
+class SessionBrowser:
+    """
+    One session's view of a pooled browser: it wraps the Chromium browser and the session's own
+    context, and offers the Playwright tools the part of the Browser API they use, contexts and
+    new_context(), so sessions share the process but not their pages, cookies or storage.
+    If the pool has reaped the context after the session sat idle, the next tool call gets a fresh one.
+    """
+
+    def __init__(self, pool: "BrowserPool", browser: Browser, context: BrowserContext):
+        self.pool = pool
+        self.browser = browser
+        self.context = context
+        self.last_used = time.monotonic()
+
+    @property
+    def contexts(self) -> list[BrowserContext]:
+        self.last_used = time.monotonic()
+        return [self.context] if self.context else []
+
+    async def new_context(self, **kwargs) -> BrowserContext:
+        if self.context is None:
+            # The browser may have been relaunched since, in which case any browser in the pool will do
+            self.context = await self.pool.new_context(self.browser if self.browser.is_connected() else None)
+            self.browser = self.context.browser
+        return self.context
+
+    def is_connected(self) -> bool:
+        return self.browser.is_connected()
+
+    async def close(self, **kwargs) -> None:
+        """Give the session's context back to the pool; the browser stays up for other sessions"""
+        await self.pool.release(self)
+
+
+class BrowserPool:
+    """
+    A process-wide pool of headless Chromium browsers shared by every Sidekick session.
+
+    Each session gets its own BrowserContext on the least busy browser, taken from a few contexts
+    kept open ahead of time, so setting up a session takes milliseconds and each one costs a context
+    rather than a browser. A session's context may hold at most BROWSER_MAX_PAGES pages, closing the
+    oldest beyond that, and is closed once the session has been idle for BROWSER_IDLE_MINUTES.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        spares: int = BROWSER_WARM_SPARES,
+        max_pages: int = BROWSER_MAX_PAGES,
+        idle_minutes: float = BROWSER_IDLE_MINUTES,
+        headless: bool = BROWSER_HEADLESS,
+    ):
+        self.size = size
+        self.spares = spares
+        self.max_pages = max_pages
+        self.idle_seconds = idle_minutes * 60
+        self.headless = headless
+        self.playwright: Playwright | None = None
+        self.browsers: list[Browser] = []
+        self.spare_contexts: list[BrowserContext] = []
+        self.filling = False
+        self.sessions: set[SessionBrowser] = set()
+        self.closing_pages: set[Page] = set()
+        self.lock = asyncio.Lock()
+        self.tasks: set[asyncio.Task] = set()
+        self.reaper: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        async with self.lock:
+            if self.playwright:
+                return
+            self.playwright = await async_playwright().start()
+            self.browsers = [await self.launch() for _ in range(self.size)]
+        await self.fill_spares()
+        self.reaper = asyncio.create_task(self.reap_periodically())
+
+    async def launch(self) -> Browser:
+        return await self.playwright.chromium.launch(headless=self.headless)
+
+    async def get_browser(self) -> Browser:
+        """The browser with the fewest open contexts, relaunching any that have crashed"""
+        async with self.lock:
+            for index, browser in enumerate(self.browsers):
+                if not browser.is_connected():
+                    self.browsers[index] = await self.launch()
+            return min(self.browsers, key=lambda browser: len(browser.contexts))
+
+    async def new_context(self, browser: Browser | None = None) -> BrowserContext:
+        context = await (browser or await self.get_browser()).new_context()
+        context.on("page", lambda page: self.limit_pages(context, page))
+        return context
+
+    def limit_pages(self, context: BrowserContext, page: Page) -> None:
+        pages = [page for page in context.pages if page not in self.closing_pages]
+        for oldest in pages[: max(0, len(pages) - self.max_pages)]:
+            self.closing_pages.add(oldest)
+            self.run_in_background(self.close_page(oldest))
+
+    async def close_page(self, page: Page) -> None:
+        try:
+            await page.close()
+        finally:
+            self.closing_pages.discard(page)
+
+    def run_in_background(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def fill_spares(self) -> None:
+        if self.filling:
+            return
+        self.filling = True
+        try:
+            while len(self.spare_contexts) < self.spares:
+                self.spare_contexts.append(await self.new_context())
+        finally:
+            self.filling = False
+
+    async def acquire(self) -> SessionBrowser:
+        """A browser for a new session, with its own context"""
+        await self.start()
+        context = None
+        while self.spare_contexts and context is None:
+            spare = self.spare_contexts.pop()
+            if spare.browser and spare.browser.is_connected():
+                context = spare
+        if context is None:
+            context = await self.new_context()
+        self.run_in_background(self.fill_spares())
+        session = SessionBrowser(self, context.browser, context)
+        self.sessions.add(session)
+        return session
+
+    async def release(self, session: SessionBrowser) -> None:
+        self.sessions.discard(session)
+        await self.close_context(session)
+
+    @staticmethod
+    async def close_context(session: SessionBrowser) -> None:
+        context, session.context = session.context, None
+        if context:
+            try:
+                await context.close()
+            except Exception as e:
+                print(f"Failed to close a browser context: {e}")
+
+    async def reap(self) -> int:
+        """Close the contexts of sessions idle for too long, returning how many were closed"""
+        now = time.monotonic()
+        idle = [s for s in self.sessions if s.context and now - s.last_used > self.idle_seconds]
+        for session in idle:
+            await self.close_context(session)
+        return len(idle)
+
+    async def reap_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(REAP_EVERY_SECONDS)
+            try:
+                await self.reap()
+            except Exception as e:
+                print(f"Failed to reap idle browser contexts: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "browsers": len(self.browsers),
+            "sessions": len(self.sessions),
+            "open_contexts": sum(1 for session in self.sessions if session.context),
+            "spare_contexts": len(self.spare_contexts),
+        }
+
+    async def close(self) -> None:
+        if self.reaper:
+            self.reaper.cancel()
+        for session in list(self.sessions):
+            await self.release(session)
+        for browser in self.browsers:
+            await browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+        self.playwright = None
+        self.browsers, self.spare_contexts, self.reaper = [], [], None
+
+
+browser_pool = BrowserPool()
@@ -5,11 +5,12 @@ from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
 from langgraph.prebuilt import ToolNode
 from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from typing import List, Any, Optional, Dict
 from pydantic import BaseModel, Field
 from sidekick_tools import playwright_tools, other_tools
+from sidekick_memory import get_checkpointer
+from sidekick_context import ContextCompactor
 import uuid
 import asyncio
 from datetime import datetime
@@ -34,27 +35,34 @@ class EvaluatorOutput(BaseModel):
 
 
 class Sidekick:
-    def __init__(self):
+    def __init__(self, sidekick_id: Optional[str] = None):
         self.worker_llm_with_tools = None
         self.evaluator_llm_with_output = None
         self.tools = None
         self.llm_with_tools = None
         self.graph = None
-        self.sidekick_id = str(uuid.uuid4())
-        self.memory = MemorySaver()
+        # Reusing the id of an earlier session carries on its conversation from the checkpoints
+        self.sidekick_id = sidekick_id or str(uuid.uuid4())
+        self.memory = None
         self.browser = None
-        self.playwright = None
-
-    async def setup(self):
-        self.tools, self.browser, self.playwright = await playwright_tools()
-        self.tools += await other_tools()
+        # Compacts what the models are sent; its stats describe the latest superstep
+        self.context = ContextCompactor()
+
+    async def setup(self, tools: Optional[List[Any]] = None):
+        """Create the models and the graph; tools replaces the browser and other tools, e.g. for benchmarks"""
+        if tools is None:
+            self.tools, self.browser = await playwright_tools()
+            self.tools += await other_tools()
+        else:
+            self.tools = tools
         worker_llm = ChatOpenAI(model="gpt-4o-mini")
         self.worker_llm_with_tools = worker_llm.bind_tools(self.tools)
         evaluator_llm = ChatOpenAI(model="gpt-4o-mini")
         self.evaluator_llm_with_output = evaluator_llm.with_structured_output(EvaluatorOutput)
+        self.memory = await get_checkpointer()
         await self.build_graph()
 
-    def worker(self, state: State) -> Dict[str, Any]:
+    async def worker(self, state: State) -> Dict[str, Any]:
         system_message = f"""You are a helpful assistant that can use tools to complete tasks.
     You keep working on a task until either you have a question or clarification for the user, or the success criteria is met.
     You have many tools to help you, including tools to browse the internet, navigating and retrieving web pages.
@@ -90,8 +98,8 @@ class Sidekick:
         if not found_system_message:
             messages = [SystemMessage(content=system_message)] + messages
 
-        # Invoke the LLM with tools
-        response = self.worker_llm_with_tools.invoke(messages)
+        # Invoke the LLM with tools, on a compacted copy of the conversation
+        response = await self.worker_llm_with_tools.ainvoke(self.context.compact(messages))
 
         # Return updated state
         return {
@@ -116,8 +124,9 @@ class Sidekick:
                 conversation += f"Assistant: {text}\n"
         return conversation
 
-    def evaluator(self, state: State) -> State:
+    async def evaluator(self, state: State) -> State:
         last_response = state["messages"][-1].content
+        conversation = [message for message in state["messages"] if isinstance(message, (HumanMessage, AIMessage))]
 
         system_message = """You are an evaluator that determines if a task has been completed successfully by an Assistant.
     Assess the Assistant's last response based on the given criteria. Respond with your feedback, and with your decision on whether the success criteria has been met,
@@ -125,8 +134,8 @@ class Sidekick:
 
         user_message = f"""You are evaluating a conversation between the User and Assistant. You decide what action to take based on the last response from the Assistant.
 
-    The entire conversation with the assistant, with the user's original request and all replies, is:
-    {self.format_conversation(state["messages"])}
+    The conversation with the assistant, with the user's request and the latest replies, is:
+    {self.format_conversation(self.context.compact(conversation))}
 
     The success criteria for this assignment is:
     {state["success_criteria"]}
@@ -150,7 +159,7 @@ class Sidekick:
             HumanMessage(content=user_message),
         ]
 
-        eval_result = self.evaluator_llm_with_output.invoke(evaluator_messages)
+        eval_result = await self.evaluator_llm_with_output.ainvoke(evaluator_messages)
         new_state = {
             "messages": [
                 {
@@ -192,31 +201,66 @@ class Sidekick:
         # Compile the graph
         self.graph = graph_builder.compile(checkpointer=self.memory)
 
-    async def run_superstep(self, message, success_criteria, history):
-        config = {"configurable": {"thread_id": self.sidekick_id}}
-
-        state = {
+    def initial_state(self, message, success_criteria) -> State:
+        return {
             "messages": message,
             "success_criteria": success_criteria or "The answer should be clear and accurate",
             "feedback_on_work": None,
             "success_criteria_met": False,
             "user_input_needed": False,
         }
+
+    async def run_superstep(self, message, success_criteria, history):
+        config = {"configurable": {"thread_id": self.sidekick_id}}
+        state = self.initial_state(message, success_criteria)
+        self.context.reset()
         result = await self.graph.ainvoke(state, config=config)
         user = {"role": "user", "content": message}
         reply = {"role": "assistant", "content": result["messages"][-2].content}
         feedback = {"role": "assistant", "content": result["messages"][-1].content}
         return history + [user, reply, feedback]
 
+    async def get_history(self) -> List[Dict[str, str]]:
+        """The conversation so far, from the thread's latest checkpoint, to show when a session resumes"""
+        snapshot = await self.graph.aget_state({"configurable": {"thread_id": self.sidekick_id}})
+        history = []
+        for message in snapshot.values.get("messages", []):
+            if isinstance(message, HumanMessage):
+                history.append({"role": "user", "content": message.content})
+            elif isinstance(message, AIMessage) and message.content and not message.tool_calls:
+                history.append({"role": "assistant", "content": message.content})
+        return history
+
+    async def stream_superstep(self, message, success_criteria, history):
+        """Like run_superstep, but yields the history after each token of the worker's reply"""
+        config = {"configurable": {"thread_id": self.sidekick_id}}
+        state = self.initial_state(message, success_criteria)
+        user = {"role": "user", "content": message}
+        reply, reply_id, result = "", None, None
+        self.context.reset()
+        async for mode, chunk in self.graph.astream(state, config=config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                result = chunk
+                continue
+            token, metadata = chunk
+            if metadata.get("langgraph_node") != "worker" or not isinstance(token.content, str):
+                continue
+            # Each call to the worker streams a new message, which replaces the last one shown
+            if token.id != reply_id:
+                reply, reply_id = "", token.id
+            if token.content:
+                reply += token.content
+                yield history + [user, {"role": "assistant", "content": reply}]
+        reply = {"role": "assistant", "content": result["messages"][-2].content}
+        feedback = {"role": "assistant", "content": result["messages"][-1].content}
+        yield history + [user, reply, feedback]
+
     def cleanup(self):
+        # Closing the session's browser gives its context back to the shared pool
         if self.browser:
             try:
                 loop = asyncio.get_running_loop()
                 loop.create_task(self.browser.close())
-                if self.playwright:
-                    loop.create_task(self.playwright.stop())
             except RuntimeError:
                 # If no loop is running, do a direct run
                 asyncio.run(self.browser.close())
-                if self.playwright:
-                    asyncio.run(self.playwright.stop())
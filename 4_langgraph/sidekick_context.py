@@ -0,0 +1,158 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from dotenv import load_dotenv
+from typing import Any, List
+import json
+import os
+import re
+
+load_dotenv(override=True)
+
+# The most context the worker is sent on each turn, and how much of each tool result it sees
+SIDEKICK_CONTEXT_TOKENS = int(os.getenv("SIDEKICK_CONTEXT_TOKENS", "12000"))
+SIDEKICK_RECENT_TOOL_RESULTS = int(os.getenv("SIDEKICK_RECENT_TOOL_RESULTS", "2"))
+SIDEKICK_TOOL_RESULT_CHARS = int(os.getenv("SIDEKICK_TOOL_RESULT_CHARS", "8000"))
+OLD_TOOL_RESULT_CHARS = 400
+# Sentences or lines shorter than this are too common to count as repeated page content
+MIN_REPEAT_CHARS = 40
+CHARS_PER_TOKEN = 4
+
+SPLIT_CHUNKS = re.compile(r"(?<=[.!?\n])\s+")
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    chars = 0
+    for message in messages:
+        chars += len(str(message.content))
+        if isinstance(message, AIMessage) and message.tool_calls:
+            chars += len(json.dumps([call["args"] for call in message.tool_calls]))
+    return chars // CHARS_PER_TOKEN
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n[... {len(text) - limit} more characters cut from this result]"
+
+
+def drop_repeats(text: str, seen: set[str]) -> str:
+    """Remove the sentences or lines of a tool result that a later tool result already includes"""
+    chunks = SPLIT_CHUNKS.split(text)
+    kept = [chunk for chunk in chunks if len(chunk) < MIN_REPEAT_CHARS or chunk not in seen]
+    repeated = len(chunks) - len(kept)
+    seen.update(chunk for chunk in chunks if len(chunk) >= MIN_REPEAT_CHARS)
+    if not repeated:
+        return text
+    if not kept:
+        return "[Same content as a later tool result]"
+    return " ".join(kept) + f"\n[{repeated} passages repeated in a later tool result were cut]"
+
+
+def group_turns(messages: List[Any]) -> List[List[Any]]:
+    """Split messages into turns that can be dropped as a whole: a tool call stays with its results"""
+    turns = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and turns:
+            turns[-1].append(message)
+        else:
+            turns.append([message])
+    return turns
+
+
+class ContextCompactor:
+    """
+    Shrinks the conversation the Sidekick sends its models, which otherwise grows with every
+    page a task visits, so that each turn costs about the same however long the task runs.
+
+    The checkpointed state keeps every message; only the copy sent to the model is compacted:
+    - passages of a tool result that a later tool result repeats, like a page visited twice, are cut
+    - the latest tool results are capped at SIDEKICK_TOOL_RESULT_CHARS and older ones at a short preview
+    - the oldest turns are dropped until the rest fits in SIDEKICK_CONTEXT_TOKENS, including the
+      earliest steps of a long task, keeping the system message, the user's latest message and
+      the latest step
+
+    It counts the tokens it saves; the Sidekick resets the counts at the start of each superstep,
+    so get_stats() describes the latest one.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = SIDEKICK_CONTEXT_TOKENS,
+        recent_tool_results: int = SIDEKICK_RECENT_TOOL_RESULTS,
+        tool_result_chars: int = SIDEKICK_TOOL_RESULT_CHARS,
+    ):
+        self.token_budget = token_budget
+        self.recent_tool_results = recent_tool_results
+        self.tool_result_chars = tool_result_chars
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.tokens_before = 0
+        self.tokens_sent = 0
+
+    def compact_tool_results(self, messages: List[Any]) -> List[Any]:
+        compacted, seen, results = [], set(), 0
+        for message in reversed(messages):
+            if isinstance(message, ToolMessage) and isinstance(message.content, str):
+                results += 1
+                limit = self.tool_result_chars if results <= self.recent_tool_results else OLD_TOOL_RESULT_CHARS
+                content = truncate(drop_repeats(message.content, seen), limit)
+                if content != message.content:
+                    message = message.model_copy(update={"content": content})
+            compacted.append(message)
+        return compacted[::-1]
+
+    def fit_budget(self, messages: List[Any]) -> List[Any]:
+        """
+        Drop whole turns, oldest first, until the messages fit the budget: first those before the
+        user's latest message, then the earliest steps of the task since then, leaving a note in
+        their place. The system message, the user's latest message and the latest step are always
+        kept, but if they are still too long the latest step's tool results are cut to a preview.
+        """
+        system = [message for message in messages[:1] if isinstance(message, SystemMessage)]
+        rest = messages[len(system) :]
+        latest_request = max(
+            (index for index, message in enumerate(rest) if isinstance(message, HumanMessage)), default=len(rest)
+        )
+        older = group_turns(rest[:latest_request])
+        request, steps = rest[latest_request : latest_request + 1], group_turns(rest[latest_request + 1 :])
+        tokens = estimate_tokens(system + request) + sum(estimate_tokens(turn) for turn in older + steps)
+        while older and tokens > self.token_budget:
+            tokens -= estimate_tokens(older.pop(0))
+        dropped = 0
+        while len(steps) > 1 and tokens > self.token_budget:
+            tokens -= estimate_tokens(steps.pop(0))
+            dropped += 1
+        if steps and tokens > self.token_budget:
+            steps[-1] = [
+                message.model_copy(update={"content": truncate(message.content, OLD_TOOL_RESULT_CHARS)})
+                if isinstance(message, ToolMessage) and isinstance(message.content, str)
+                else message
+                for message in steps[-1]
+            ]
+        note = [AIMessage(content=f"[{dropped} earlier steps of this task were left out to save space]")]
+        return (
+            system
+            + [message for turn in older for message in turn]
+            + request
+            + (note if dropped else [])
+            + [message for turn in steps for message in turn]
+        )
+
+    def compact(self, messages: List[Any]) -> List[Any]:
+        """The messages to send the model in place of the full conversation"""
+        compacted = self.fit_budget(self.compact_tool_results(messages))
+        self.calls += 1
+        self.tokens_before += estimate_tokens(messages)
+        self.tokens_sent += estimate_tokens(compacted)
+        return compacted
+
+    def get_stats(self) -> dict:
+        saved = self.tokens_before - self.tokens_sent
+        return {
+            "calls": self.calls,
+            "tokens_before": self.tokens_before,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": saved,
+            "saved_share": saved / self.tokens_before if self.tokens_before else 0.0,
+        }
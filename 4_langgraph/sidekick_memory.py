@@ -0,0 +1,112 @@
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from dotenv import load_dotenv
+import aiosqlite
+import asyncio
+import os
+
+load_dotenv(override=True)
+
+SIDEKICK_DB = os.getenv("SIDEKICK_DB", "memory.db")
+SIDEKICK_KEEP_CHECKPOINTS = int(os.getenv("SIDEKICK_KEEP_CHECKPOINTS", "10"))
+SIDEKICK_VACUUM_MINUTES = float(os.getenv("SIDEKICK_VACUUM_MINUTES", "30"))
+
+# Only rewrite the database when at least this share of its pages were freed by pruning
+VACUUM_FREE_FRACTION = 0.25
+
+# Checkpoint ids are time ordered, so everything older than the thread's Kth newest checkpoint goes
+PRUNE_WRITES_SQL = """
+    DELETE FROM writes
+    WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < (
+        SELECT checkpoint_id FROM checkpoints
+        WHERE thread_id = ? AND checkpoint_ns = ?
+        ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?
+    )
+"""
+PRUNE_CHECKPOINTS_SQL = """
+    DELETE FROM checkpoints
+    WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < (
+        SELECT checkpoint_id FROM checkpoints
+        WHERE thread_id = ? AND checkpoint_ns = ?
+        ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?
+    )
+"""
+
+
+class PrunedSqliteSaver(AsyncSqliteSaver):
+    """
+    An async SQLite checkpointer that keeps only the latest checkpoints of each thread.
+
+    Each checkpoint holds the thread's whole state, so the latest one is all a conversation needs to
+    carry on, including after a restart; older ones are only kept to rewind to. Pruning happens as
+    each checkpoint is saved, and the space it frees is reclaimed by a periodic vacuum.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, keep: int = SIDEKICK_KEEP_CHECKPOINTS, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.keep = keep
+        self.vacuum_task = None
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        await self.prune(config["configurable"]["thread_id"], config["configurable"]["checkpoint_ns"])
+        return next_config
+
+    async def prune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        params = (str(thread_id), checkpoint_ns, str(thread_id), checkpoint_ns, self.keep - 1)
+        async with self.lock:
+            await self.conn.execute(PRUNE_WRITES_SQL, params)
+            await self.conn.execute(PRUNE_CHECKPOINTS_SQL, params)
+            await self.conn.commit()
+
+    async def vacuum(self) -> bool:
+        """Rewrite the database if enough of it is free pages; returns whether it did"""
+        async with self.lock:
+            async with self.conn.execute("PRAGMA page_count") as cursor:
+                pages = (await cursor.fetchone())[0]
+            async with self.conn.execute("PRAGMA freelist_count") as cursor:
+                free = (await cursor.fetchone())[0]
+            if not pages or free / pages < VACUUM_FREE_FRACTION:
+                return False
+            await self.conn.execute("VACUUM")
+            await self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return True
+
+    async def vacuum_periodically(self, minutes: float) -> None:
+        while True:
+            await asyncio.sleep(minutes * 60)
+            try:
+                await self.vacuum()
+            except Exception as e:
+                print(f"Failed to vacuum the sidekick checkpoints: {e}")
+
+    def start_vacuum(self, minutes: float = SIDEKICK_VACUUM_MINUTES) -> None:
+        if self.vacuum_task is None:
+            self.vacuum_task = asyncio.create_task(self.vacuum_periodically(minutes))
+
+
+_checkpointer: PrunedSqliteSaver | None = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def get_checkpointer() -> PrunedSqliteSaver:
+    """The checkpointer shared by every Sidekick in this process, opened on first use"""
+    global _checkpointer
+    async with _checkpointer_lock:
+        if _checkpointer is None:
+            conn = aiosqlite.connect(SIDEKICK_DB)
+            # The connection runs on its own thread, which mustn't keep the app alive when it's stopped
+            conn.daemon = True
+            checkpointer = PrunedSqliteSaver(await conn)
+            await checkpointer.setup()
+            checkpointer.start_vacuum()
+            _checkpointer = checkpointer
+    return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    global _checkpointer
+    async with _checkpointer_lock:
+        if _checkpointer is not None:
+            _checkpointer.vacuum_task.cancel()
+            await _checkpointer.conn.close()
+            _checkpointer = None
@@ -1,4 +1,4 @@
-from playwright.async_api import async_playwright
+from browser_pool import browser_pool
 from langchain_community.agent_toolkits import PlayWrightBrowserToolkit
 from dotenv import load_dotenv
 import os
@@ -9,6 +9,12 @@ from langchain_community.tools.wikipedia.tool import WikipediaQueryRun
 from langchain_experimental.tools import PythonREPLTool
 from langchain_community.utilities import GoogleSerperAPIWrapper
 from langchain_community.utilities.wikipedia import WikipediaAPIWrapper
+from langchain_core.runnables.config import run_in_executor
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import time
 
 
 
@@ -18,11 +24,86 @@ pushover_user = os.getenv("PUSHOVER_USER")
 pushover_url = "https://api.pushover.net/1/messages.json"
 serper = GoogleSerperAPIWrapper()
 
+# Blocking tools run on their own bounded pool, so a burst of tool calls can't starve the app's threads
+SIDEKICK_TOOL_THREADS = int(os.getenv("SIDEKICK_TOOL_THREADS", "8"))
+SIDEKICK_TOOL_CACHE_MINUTES = float(os.getenv("SIDEKICK_TOOL_CACHE_MINUTES", "10"))
+TOOL_CACHE_SIZE = 500
+tool_executor = ThreadPoolExecutor(max_workers=SIDEKICK_TOOL_THREADS, thread_name_prefix="sidekick-tool")
+
+
+def pooled(func):
+    """An async version of a blocking tool function, which runs it on the tools' thread pool"""
+
+    async def run(*args, **kwargs):
+        return await run_in_executor(tool_executor, func, *args, **kwargs)
+
+    return run
+
+
+class ToolCache:
+    """
+    Remembers the results of idempotent tools, like searches, for a few minutes, keyed by the tool's
+    name and arguments and shared by every session. Identical calls made while the first is still
+    running wait for its result rather than calling the tool again. Failures aren't cached.
+    """
+
+    def __init__(self, ttl_minutes: float = SIDEKICK_TOOL_CACHE_MINUTES, size: int = TOOL_CACHE_SIZE):
+        self.ttl = ttl_minutes * 60
+        self.size = size
+        self.results: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.pending: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def wrap(self, name: str, coroutine):
+        async def run(*args, **kwargs):
+            return await self.call(name, coroutine, *args, **kwargs)
+
+        return run
+
+    async def call(self, name: str, coroutine, *args, **kwargs):
+        key = json.dumps([name, args, kwargs], sort_keys=True, default=str)
+        cached = self.results.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.results.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        if key in self.pending:
+            self.hits += 1
+            return await asyncio.shield(self.pending[key])
+        self.misses += 1
+        task = asyncio.ensure_future(coroutine(*args, **kwargs))
+        self.pending[key] = task
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self.pending.pop(key, None)
+        self.results[key] = (time.monotonic() + self.ttl, result)
+        self.results.move_to_end(key)
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+        return result
+
+    def get_stats(self) -> dict:
+        calls = self.hits + self.misses
+        return {
+            "entries": len(self.results),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / calls if calls else 0.0,
+        }
+
+
+tool_cache = ToolCache()
+
 async def playwright_tools():
-    playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch(headless=False)
-    toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=browser)
-    return toolkit.get_tools(), browser, playwright
+    session = await browser_pool.acquire()
+    toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=session.browser)
+    tools = toolkit.get_tools()
+    # The tools find their page through the browser's contexts, so they're given the session's view of it
+    for tool in tools:
+        tool.async_browser = session
+    return tools, session
 
 
 def push(text: str):
@@ -37,17 +118,26 @@ def get_file_tools():
 
 
 async def other_tools():
-    push_tool = Tool(name="send_push_notification", func=push, description="Use this tool when you want to send a push notification")
+    push_tool = Tool(name="send_push_notification", func=push, coroutine=pooled(push), description="Use this tool when you want to send a push notification")
     file_tools = get_file_tools()
 
+    # Searches and Wikipedia lookups are cached, and the search uses Serper's async client
     tool_search =Tool(
         name="search",
         func=serper.run,
+        coroutine=tool_cache.wrap("search", serper.arun),
         description="Use this tool when you want to get the results of an online web search"
     )
 
     wikipedia = WikipediaAPIWrapper()
-    wiki_tool = WikipediaQueryRun(api_wrapper=wikipedia)
+    wiki_query = WikipediaQueryRun(api_wrapper=wikipedia)
+    wiki_tool = Tool(
+        name=wiki_query.name,
+        func=wikipedia.run,
+        coroutine=tool_cache.wrap(wiki_query.name, pooled(wikipedia.run)),
+        description=wiki_query.description,
+        args_schema=wiki_query.args_schema,
+    )
 
     python_repl = PythonREPLTool()
     
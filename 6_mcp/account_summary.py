@@ -0,0 +1,97 @@
+from dotenv import load_dotenv
+import json
+import os
+
+load_dotenv(override=True)
+
+# How many of the latest transactions go into the prompt, and an optional cap on the summary's size
+ACCOUNT_SUMMARY_TRANSACTIONS = int(os.getenv("ACCOUNT_SUMMARY_TRANSACTIONS", "10"))
+ACCOUNT_SUMMARY_TOKEN_BUDGET = int(os.getenv("ACCOUNT_SUMMARY_TOKEN_BUDGET", "0")) or None
+RATIONALE_CHARS = 200
+MOST_TRADED = 5
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def get_holdings(holdings: dict[str, int], positions: dict[str, dict]) -> list[dict]:
+    """The holdings with the cost basis the account report gives for each position"""
+    summary = []
+    for symbol, quantity in holdings.items():
+        position = positions.get(symbol)
+        holding = {"symbol": symbol, "quantity": quantity}
+        # Shares that did not come from recorded trades have no known cost
+        if position and position["quantity"] == quantity and quantity > 0:
+            holding["average_cost"] = position["average_cost"]
+            holding["cost_basis"] = position["cost_basis"]
+        summary.append(holding)
+    return summary
+
+
+def get_stats(transactions: list[dict], realized_profit_loss: float) -> dict:
+    buys = [t for t in transactions if t["quantity"] > 0]
+    sells = [t for t in transactions if t["quantity"] < 0]
+    counts = {}
+    for transaction in transactions:
+        counts[transaction["symbol"]] = counts.get(transaction["symbol"], 0) + 1
+    most_traded = sorted(counts, key=counts.get, reverse=True)[:MOST_TRADED]
+    return {
+        "trades": len(transactions),
+        "buys": len(buys),
+        "sells": len(sells),
+        "total_bought": round(sum(t["quantity"] * t["price"] for t in buys), 2),
+        "total_sold": round(sum(-t["quantity"] * t["price"] for t in sells), 2),
+        "realized_profit_loss": round(realized_profit_loss, 2),
+        "first_trade": transactions[0]["timestamp"] if transactions else None,
+        "last_trade": transactions[-1]["timestamp"] if transactions else None,
+        "most_traded": {symbol: counts[symbol] for symbol in most_traded},
+    }
+
+
+def get_recent(transactions: list[dict], recent: int) -> list[dict]:
+    latest = transactions[-recent:] if recent > 0 else []
+    return [
+        {
+            "timestamp": t["timestamp"],
+            "symbol": t["symbol"],
+            "quantity": t["quantity"],
+            "price": t["price"],
+            "rationale": t["rationale"][:RATIONALE_CHARS],
+        }
+        for t in latest
+    ]
+
+
+def summarize_account(
+    account: dict,
+    recent: int = ACCOUNT_SUMMARY_TRANSACTIONS,
+    token_budget: int | None = ACCOUNT_SUMMARY_TOKEN_BUDGET,
+) -> str:
+    """
+    A compact JSON summary of an account report for the trader's prompt, which stays the same size
+    however long the account has been trading: the holdings with their cost basis, aggregate
+    statistics over the whole history, and only the most recent transactions in full.
+    The cost basis and realized profit or loss are taken from the report, which the account keeps
+    up to date trade by trade, rather than worked out again from the transactions.
+    The strategy is left out as the prompt already includes it.
+
+    With a token budget, the oldest of the recent transactions are dropped until the summary fits;
+    the holdings and statistics are always kept.
+    """
+    transactions = account.get("transactions", [])
+    summary = {
+        "name": account["name"],
+        "balance": round(account["balance"], 2),
+        "total_portfolio_value": round(account.get("total_portfolio_value", 0.0), 2),
+        "total_profit_loss": round(account.get("total_profit_loss", 0.0), 2),
+        "holdings": get_holdings(account.get("holdings", {}), account.get("positions", {})),
+        "trading_stats": get_stats(transactions, account.get("realized_profit_loss", 0.0)),
+        "recent_transactions": get_recent(transactions, recent),
+    }
+    text = json.dumps(summary)
+    while token_budget and estimate_tokens(text) > token_budget and summary["recent_transactions"]:
+        summary["recent_transactions"].pop(0)
+        text = json.dumps(summary)
+    return text
@@ -1,14 +1,26 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+from typing import Literal
 import json
+import os
 from dotenv import load_dotenv
-from datetime import datetime
-from market import get_share_price
-from database import write_account, read_account, write_log
+from market import get_share_prices
+from simulation import now
+from positions import Ledger, CostBasisMethod
+from database import (
+    write_account,
+    read_account,
+    write_strategy,
+    write_account_changes,
+    write_portfolio_value,
+    write_log,
+)
 
 load_dotenv(override=True)
 
 INITIAL_BALANCE = 10_000.0
 SPREAD = 0.002
+COST_BASIS_METHOD = CostBasisMethod(os.getenv("COST_BASIS_METHOD", "fifo").strip().lower())
+MAX_UPDATE_ATTEMPTS = 3
 
 
 class Transaction(BaseModel):
@@ -25,13 +37,23 @@ class Transaction(BaseModel):
         return f"{abs(self.quantity)} shares of {self.symbol} at {self.price} each."
 
 
+class Order(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    side: Literal["buy", "sell"]
+    symbol: str
+    quantity: int
+    rationale: str
+
+
 class Account(BaseModel):
     name: str
     balance: float
     strategy: str
     holdings: dict[str, int]
     transactions: list[Transaction]
-    portfolio_value_time_series: list[tuple[str, float]]
+    _ledger: Ledger | None = PrivateAttr(default=None)
+    _version: int = PrivateAttr(default=0)
 
     @classmethod
     def get(cls, name: str):
@@ -43,100 +65,165 @@ class Account(BaseModel):
                 "strategy": "",
                 "holdings": {},
                 "transactions": [],
-                "portfolio_value_time_series": []
             }
-            write_account(name, fields)
-        return cls(**fields)
+            fields["version"] = write_account(name, fields)
+        account = cls(**fields)
+        account._version = fields["version"]
+        return account
+
+    def refresh(self):
+        """ Reload the account, after finding that someone else has changed it. """
+        fields = read_account(self.name)
+        self.balance = fields["balance"]
+        self.strategy = fields["strategy"]
+        self.holdings = fields["holdings"]
+        self.transactions = [Transaction(**transaction) for transaction in fields["transactions"]]
+        self._ledger = None
+        self._version = fields["version"]
     
     
+    @property
+    def ledger(self) -> Ledger:
+        """ Position accounting for this account, built from the transactions on first use and then updated per trade. """
+        if self._ledger is None:
+            self._ledger = Ledger.from_transactions(self.transactions, COST_BASIS_METHOD)
+        return self._ledger
+
+    def record(self, transaction: Transaction):
+        self.transactions.append(transaction)
+        if self._ledger is not None:
+            self._ledger.apply(transaction.symbol, transaction.quantity, transaction.price)
+
     def save(self):
-        write_account(self.name.lower(), self.model_dump())
+        """ Rewrite the whole account; trades and reports use the incremental writes instead. """
+        self._version = write_account(self.name.lower(), self.model_dump())
+
+    def seen(self, version: int | None):
+        """
+        Catch up with a write of our own that bumped the version without changing balance or holdings.
+        Only if it is the very next version: otherwise someone else changed the account too, and the
+        next commit should notice and reload.
+        """
+        if version == self._version + 1:
+            self._version = version
+
+    def commit(self, plan) -> list[Transaction]:
+        """
+        Apply the change that plan() works out from the account's current state: a new balance, the new
+        quantities of any holdings it changes and the transactions to record. The write only lands if
+        no one else has changed the account since it was read; if they have, the lost update is logged,
+        the account reloaded and the plan worked out again from the fresh state.
+        """
+        for attempt in range(1, MAX_UPDATE_ATTEMPTS + 1):
+            balance, holdings, transactions = plan()
+            changes = [transaction.model_dump() for transaction in transactions]
+            if write_account_changes(self.name, self._version, balance, holdings, changes):
+                self._version += 1
+                self.balance = balance
+                for symbol, quantity in holdings.items():
+                    if quantity:
+                        self.holdings[symbol] = quantity
+                    else:
+                        self.holdings.pop(symbol, None)
+                for transaction in transactions:
+                    self.record(transaction)
+                return transactions
+            write_log(self.name, "account", f"Update conflicted with another change (attempt {attempt}), retrying")
+            self.refresh()
+        raise ValueError(f"The account kept changing; gave up after {MAX_UPDATE_ATTEMPTS} attempts.")
 
     def reset(self, strategy: str):
         self.balance = INITIAL_BALANCE
         self.strategy = strategy
         self.holdings = {}
         self.transactions = []
-        self.portfolio_value_time_series = []
+        self._ledger = None
         self.save()
 
     def deposit(self, amount: float):
         """ Deposit funds into the account. """
         if amount <= 0:
             raise ValueError("Deposit amount must be positive.")
-        self.balance += amount
+        self.commit(lambda: (self.balance + amount, {}, []))
         print(f"Deposited ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def withdraw(self, amount: float):
         """ Withdraw funds from the account, ensuring it doesn't go negative. """
-        if amount > self.balance:
-            raise ValueError("Insufficient funds for withdrawal.")
-        self.balance -= amount
+        def plan():
+            if amount > self.balance:
+                raise ValueError("Insufficient funds for withdrawal.")
+            return self.balance - amount, {}, []
+
+        self.commit(plan)
         print(f"Withdrew ${amount}. New balance: ${self.balance}")
-        self.save()
 
     def buy_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Buy shares of a stock if sufficient funds are available. """
-        price = get_share_price(symbol)
-        buy_price = price * (1 + SPREAD)
-        total_cost = buy_price * quantity
-        
-        if total_cost > self.balance:
-            raise ValueError("Insufficient funds to buy shares.")
-        elif price==0:
-            raise ValueError(f"Unrecognized symbol {symbol}")
-        
-        # Update holdings
-        self.holdings[symbol] = self.holdings.get(symbol, 0) + quantity
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=quantity, price=buy_price, timestamp=timestamp, rationale=rationale)
-        self.transactions.append(transaction)
-        
-        # Update balance
-        self.balance -= total_cost
-        self.save()
-        write_log(self.name, "account", f"Bought {quantity} of {symbol}")
-        return "Completed. Latest details:\n" + self.report()
+        return self.submit_orders([Order(side="buy", symbol=symbol, quantity=quantity, rationale=rationale)])
 
     def sell_shares(self, symbol: str, quantity: int, rationale: str) -> str:
         """ Sell shares of a stock if the user has enough shares. """
-        if self.holdings.get(symbol, 0) < quantity:
-            raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
-        
-        price = get_share_price(symbol)
-        sell_price = price * (1 - SPREAD)
-        total_proceeds = sell_price * quantity
-        
-        # Update holdings
-        self.holdings[symbol] -= quantity
-        
-        # If shares are completely sold, remove from holdings
-        if self.holdings[symbol] == 0:
-            del self.holdings[symbol]
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Record transaction
-        transaction = Transaction(symbol=symbol, quantity=-quantity, price=sell_price, timestamp=timestamp, rationale=rationale)  # negative quantity for sell
-        self.transactions.append(transaction)
+        return self.submit_orders([Order(side="sell", symbol=symbol, quantity=quantity, rationale=rationale)])
 
-        # Update balance
-        self.balance += total_proceeds
-        self.save()
-        write_log(self.name, "account", f"Sold {quantity} of {symbol}")
+    def plan_orders(self, orders: list[Order], prices: dict[str, float]):
+        """ Work out the effect of a batch of orders on the account, raising if any of them can't be filled.
+        Sells go first so that their proceeds can pay for the buys. """
+        balance = self.balance
+        holdings = {}
+        transactions = []
+        timestamp = now()
+        for order in sorted(orders, key=lambda order: order.side == "buy"):
+            symbol, quantity = order.symbol, order.quantity
+            price = prices.get(symbol, 0.0)
+            held = holdings.get(symbol, self.holdings.get(symbol, 0))
+            if quantity <= 0:
+                raise ValueError(f"Quantity must be positive, not {quantity} for {symbol}.")
+            elif price == 0:
+                raise ValueError(f"Unrecognized symbol {symbol}")
+            if order.side == "buy":
+                trade_price = price * (1 + SPREAD)
+                if trade_price * quantity > balance:
+                    raise ValueError(f"Insufficient funds to buy {quantity} shares of {symbol}.")
+                balance -= trade_price * quantity
+                holdings[symbol] = held + quantity
+            else:
+                if held < quantity:
+                    raise ValueError(f"Cannot sell {quantity} shares of {symbol}. Not enough shares held.")
+                trade_price = price * (1 - SPREAD)
+                balance += trade_price * quantity
+                holdings[symbol] = held - quantity
+                quantity = -quantity  # negative quantity for sell
+            transactions.append(
+                Transaction(symbol=symbol, quantity=quantity, price=trade_price, timestamp=timestamp, rationale=order.rationale)
+            )
+        return balance, holdings, transactions
+
+    def submit_orders(self, orders: list[Order]) -> str:
+        """ Execute a batch of buy and sell orders as one atomic change: either all are filled or none are. """
+        prices = get_share_prices([order.symbol for order in orders])
+        transactions = self.commit(lambda: self.plan_orders(orders, prices))
+        for transaction in transactions:
+            action = "Bought" if transaction.quantity > 0 else "Sold"
+            write_log(self.name, "account", f"{action} {abs(transaction.quantity)} of {transaction.symbol}")
         return "Completed. Latest details:\n" + self.report()
 
-    def calculate_portfolio_value(self):
+    def get_prices(self) -> dict[str, float]:
+        """ Look up the current price of every holding in one go. """
+        return get_share_prices(list(self.holdings))
+
+    def calculate_portfolio_value(self, prices: dict[str, float] | None = None):
         """ Calculate the total value of the user's portfolio. """
-        total_value = self.balance
-        for symbol, quantity in self.holdings.items():
-            total_value += get_share_price(symbol) * quantity
-        return total_value
+        prices = self.get_prices() if prices is None else prices
+        return self.balance + sum(prices.get(symbol, 0.0) * quantity for symbol, quantity in self.holdings.items())
 
     def calculate_profit_loss(self, portfolio_value: float):
         """ Calculate profit or loss from the initial spend. """
-        initial_spend = sum(transaction.total() for transaction in self.transactions)
-        return portfolio_value - initial_spend - self.balance
+        return self.ledger.profit_loss(portfolio_value - self.balance)
+
+    def get_positions(self, prices: dict[str, float] | None = None) -> dict[str, dict]:
+        """ Report cost basis and realized and unrealized profit or loss for each holding. """
+        prices = self.get_prices() if prices is None else prices
+        return self.ledger.summary(prices)
 
     def get_holdings(self):
         """ Report the current holdings of the user. """
@@ -144,21 +231,24 @@ class Account(BaseModel):
 
     def get_profit_loss(self):
         """ Report the user's profit or loss at any point in time. """
-        return self.calculate_profit_loss()
+        return self.calculate_profit_loss(self.calculate_portfolio_value())
 
     def list_transactions(self):
         """ List all transactions made by the user. """
         return [transaction.model_dump() for transaction in self.transactions]
     
     def report(self) -> str:
-        """ Return a json string representing the account.  """
-        portfolio_value = self.calculate_portfolio_value()
-        self.portfolio_value_time_series.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), portfolio_value))
-        self.save()
+        """ Return a json string representing the account, with the cost basis and profit or loss of each holding and the profit or loss realized by all its sales.  """
+        prices = self.get_prices()
+        portfolio_value = self.calculate_portfolio_value(prices)
+        timestamp = now()
+        self.seen(write_portfolio_value(self.name, timestamp, portfolio_value))
         pnl = self.calculate_profit_loss(portfolio_value)
         data = self.model_dump()
         data["total_portfolio_value"] = portfolio_value
         data["total_profit_loss"] = pnl
+        data["positions"] = self.get_positions(prices)
+        data["realized_profit_loss"] = self.ledger.realized_profit_loss()
         write_log(self.name, "account", f"Retrieved account details")
         return json.dumps(data)
     
@@ -170,7 +260,7 @@ class Account(BaseModel):
     def change_strategy(self, strategy: str) -> str:
         """ At your discretion, if you choose to, call this to change your investment strategy for the future """
         self.strategy = strategy
-        self.save()
+        self.seen(write_strategy(self.name, strategy))
         write_log(self.name, "account", f"Changed strategy")
         return "Changed strategy"
 
@@ -2,38 +2,130 @@ import mcp
 from mcp.client.stdio import stdio_client
 from mcp import StdioServerParameters
 from agents import FunctionTool
+import anyio
+import asyncio
 import json
 
 params = StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=None)
 
+# Failures that mean the connection to the accounts server is gone, rather than that a request failed;
+# an McpError is the server's answer to a bad request, so retrying it could repeat a trade
+CONNECTION_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+)
+
+
+class AccountsSession:
+    """
+    Keeps one MCP session with the accounts server alive for the process, instead of launching
+    the server and repeating the initialize handshake for every request.
+
+    The stdio transport is owned by a background task, as anyio requires its context to be entered
+    and exited in the same task. Requests from any task share the session concurrently; if the
+    server goes away, the session is restarted and the request is retried once.
+    """
+
+    def __init__(self, params: StdioServerParameters):
+        self.params = params
+        self.session: mcp.ClientSession | None = None
+        self.task: asyncio.Task | None = None
+        self.ready: asyncio.Future | None = None
+        self.closing: asyncio.Event | None = None
+        self.lock: asyncio.Lock | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    async def run(self) -> None:
+        try:
+            async with stdio_client(self.params) as streams:
+                async with mcp.ClientSession(*streams) as session:
+                    await session.initialize()
+                    self.session = session
+                    self.ready.set_result(session)
+                    await self.closing.wait()
+        except Exception as e:
+            if not self.ready.done():
+                self.ready.set_exception(e)
+        finally:
+            self.session = None
+
+    async def get_session(self) -> mcp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # A new event loop (for example a fresh asyncio.run) can't use a session from the old one
+            self.loop = loop
+            self.lock = asyncio.Lock()
+            self.task = None
+        async with self.lock:
+            if self.task is None or self.task.done():
+                self.ready = loop.create_future()
+                self.closing = asyncio.Event()
+                self.task = loop.create_task(self.run())
+            return await asyncio.shield(self.ready)
+
+    async def request(self, fn):
+        session = await self.get_session()
+        try:
+            return await fn(session)
+        except CONNECTION_ERRORS:
+            await self.restart(session)
+            session = await self.get_session()
+            return await fn(session)
+
+    async def restart(self, failed: mcp.ClientSession) -> None:
+        """Stop the session that failed, unless another request has already replaced it"""
+        async with self.lock:
+            if self.session is failed:
+                await self.stop()
+
+    async def stop(self) -> None:
+        if self.task and not self.task.done():
+            self.closing.set()
+            await self.task
+        self.task = None
+
+    async def close(self) -> None:
+        if self.lock is None:
+            return
+        async with self.lock:
+            await self.stop()
+
+
+accounts_session = AccountsSession(params)
+
+
+async def close_accounts_session():
+    await accounts_session.close()
+
+
+def use_accounts_server_env(env: dict[str, str]) -> None:
+    """Talk to an accounts server launched with extra environment, such as the settings for a backtest"""
+    global accounts_session
+    accounts_session = AccountsSession(
+        StdioServerParameters(command="uv", args=["run", "accounts_server.py"], env=env)
+    )
+
 
 async def list_accounts_tools():
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            tools_result = await session.list_tools()
-            return tools_result.tools
-        
+    tools_result = await accounts_session.request(lambda session: session.list_tools())
+    return tools_result.tools
+
 async def call_accounts_tool(tool_name, tool_args):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, tool_args)
-            return result
-            
+    return await accounts_session.request(lambda session: session.call_tool(tool_name, tool_args))
+
 async def read_accounts_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://accounts_server/{name}")
-            return result.contents[0].text
-        
+    result = await accounts_session.request(
+        lambda session: session.read_resource(f"accounts://accounts_server/{name}")
+    )
+    return result.contents[0].text
+
 async def read_strategy_resource(name):
-    async with stdio_client(params) as streams:
-        async with mcp.ClientSession(*streams) as session:
-            await session.initialize()
-            result = await session.read_resource(f"accounts://strategy/{name}")
-            return result.contents[0].text
+    result = await accounts_session.request(
+        lambda session: session.read_resource(f"accounts://strategy/{name}")
+    )
+    return result.contents[0].text
 
 async def get_accounts_tools_openai():
     openai_tools = []
@@ -44,7 +136,7 @@ async def get_accounts_tools_openai():
             description=tool.description,
             params_json_schema=schema,
             on_invoke_tool=lambda ctx, args, toolname=tool.name: call_accounts_tool(toolname, json.loads(args))
-                
+
         )
         openai_tools.append(openai_tool)
-    return openai_tools
\ No newline at end of file
+    return openai_tools
@@ -1,5 +1,5 @@
 from mcp.server.fastmcp import FastMCP
-from accounts import Account
+from accounts import Account, Order
 
 mcp = FastMCP("accounts_server")
 
@@ -46,6 +46,17 @@ async def sell_shares(name: str, symbol: str, quantity: int, rationale: str) ->
     """
     return Account.get(name).sell_shares(symbol, quantity, rationale)
 
+@mcp.tool()
+async def submit_orders(name: str, orders: list[Order]) -> str:
+    """Buy and sell several stocks in one go, such as when rebalancing. The orders are filled together
+    or not at all, and sells are filled first so their proceeds can pay for the buys.
+
+    Args:
+        name: The name of the account holder
+        orders: The orders, each with a side ("buy" or "sell"), symbol, quantity and rationale
+    """
+    return Account.get(name).submit_orders(orders)
+
 @mcp.tool()
 async def change_strategy(name: str, strategy: str) -> str:
     """At your discretion, if you choose to, call this to change your investment strategy for the future.
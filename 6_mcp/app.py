@@ -4,7 +4,25 @@ import pandas as pd
 from trading_floor import names, lastnames, short_model_names
 import plotly.express as px
 from accounts import Account
-from database import read_log
+from database import read_log_since, read_account_version, read_trader_metrics, read_costliest_spans
+from timeseries import get_portfolio_value_series, CHART_POINTS
+from collections import deque
+import threading
+
+LOG_LINES = 13
+ACCOUNT_POLL_SECONDS = 2
+PORTFOLIO_VALUE_REFRESH_SECONDS = 120
+METRICS_REFRESH_SECONDS = 60
+COSTLIEST_CALLS = 10
+
+TRADER_METRICS_HEADERS = [
+    "Name", "Cycles", "Model calls", "Tool calls", "Input tokens", "Output tokens", "Cached tokens",
+    "Cost ($)", "Mean cycle (s)",
+]
+COSTLIEST_CALLS_HEADERS = [
+    "Name", "Agent", "Model", "Started", "Latency (s)", "Input tokens", "Output tokens", "Cached tokens",
+    "Cost ($)",
+]
 
 mapper = {
     "trace": Color.WHITE,
@@ -21,11 +39,25 @@ class Trader:
         self.name = name
         self.lastname = lastname
         self.model_name = model_name
-        self.account = Account.get(name)
+        self.lock = threading.Lock()
+        self.log_lines = deque(maxlen=LOG_LINES)
+        self.last_log_id = 0
+        self.logs_html = self.render_logs()
+        self.reload()
 
     def reload(self):
+        self.version = read_account_version(self.name)
         self.account = Account.get(self.name)
 
+    def get_account_version(self) -> int | None:
+        """Check the account's version, reloading it only if it has changed since it was last loaded"""
+        version = read_account_version(self.name)
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.reload()
+        return self.version
+
     def get_title(self) -> str:
         return f"<div style='text-align: center;font-size:34px;'>{self.name}<span style='color:#ccc;font-size:24px;'> ({self.model_name}) - {self.lastname}</span></div>"
 
@@ -33,7 +65,7 @@ class Trader:
         return self.account.get_strategy()
 
     def get_portfolio_value_df(self) -> pd.DataFrame:
-        df = pd.DataFrame(self.account.portfolio_value_time_series, columns=["datetime", "value"])
+        df = pd.DataFrame(get_portfolio_value_series(self.name, CHART_POINTS), columns=["datetime", "value"])
         df["datetime"] = pd.to_datetime(df["datetime"])
         return df
 
@@ -80,14 +112,20 @@ class Trader:
         emoji = "⬆" if pnl >= 0 else "⬇"
         return f"<div style='text-align: center;background-color:{color};'><span style='font-size:32px'>${portfolio_value:,.0f}</span><span style='font-size:24px'>&nbsp;&nbsp;&nbsp;{emoji}&nbsp;${pnl:,.0f}</span></div>"
 
+    def render_logs(self) -> str:
+        return f"<div style='height:250px; overflow-y:auto;'>{''.join(self.log_lines)}</div>"
+
     def get_logs(self, previous=None) -> str:
-        logs = read_log(self.name, last_n=13)
-        response = ""
-        for log in logs:
-            timestamp, type, message = log
-            color = mapper.get(type, Color.WHITE).value
-            response += f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>"
-        response = f"<div style='height:250px; overflow-y:auto;'>{response}</div>"
+        """Fetch only the log entries written since the last poll, shared by every viewer"""
+        with self.lock:
+            logs = read_log_since(self.name, self.last_log_id, last_n=LOG_LINES)
+            if logs:
+                for id, timestamp, type, message in logs:
+                    color = mapper.get(type, Color.WHITE).value
+                    self.log_lines.append(f"<span style='color:{color}'>{timestamp} : [{type}] {message}</span><br/>")
+                self.last_log_id = logs[-1][0]
+                self.logs_html = self.render_logs()
+            response = self.logs_html
         if response != previous:
             return response
         return gr.update()
@@ -133,19 +171,31 @@ class TraderView:
                     elem_classes=["dataframe-fix"],
                 )
 
-        timer = gr.Timer(value=120)
-        timer.tick(
+            # The account version this viewer is showing
+            self.version = gr.State(self.trader.version)
+
+        account_timer = gr.Timer(value=ACCOUNT_POLL_SECONDS)
+        account_timer.tick(
             fn=self.refresh,
-            inputs=[],
+            inputs=[self.version],
             outputs=[
                 self.portfolio_value,
                 self.chart,
                 self.holdings_table,
                 self.transactions_table,
+                self.version,
             ],
             show_progress="hidden",
             queue=False,
         )
+        timer = gr.Timer(value=PORTFOLIO_VALUE_REFRESH_SECONDS)
+        timer.tick(
+            fn=self.trader.get_portfolio_value,
+            inputs=[],
+            outputs=[self.portfolio_value],
+            show_progress="hidden",
+            queue=False,
+        )
         log_timer = gr.Timer(value=0.5)
         log_timer.tick(
             fn=self.trader.get_logs,
@@ -155,14 +205,60 @@ class TraderView:
             queue=False,
         )
 
-    def refresh(self):
-        self.trader.reload()
+    def refresh(self, seen_version):
+        """Re-render the account panels only when the account has changed since this viewer last saw it"""
+        version = self.trader.get_account_version()
+        if version == seen_version:
+            return gr.update(), gr.update(), gr.update(), gr.update(), seen_version
         return (
             self.trader.get_portfolio_value(),
             self.trader.get_portfolio_value_chart(),
             self.trader.get_holdings_df(),
             self.trader.get_transactions_df(),
+            version,
+        )
+
+
+def get_trader_metrics_df() -> pd.DataFrame:
+    """Token usage and cost per trader, summed over all of their cycles"""
+    df = pd.DataFrame(read_trader_metrics(), columns=TRADER_METRICS_HEADERS)
+    return df.round({"Cost ($)": 4, "Mean cycle (s)": 1})
+
+
+def get_costliest_calls_df() -> pd.DataFrame:
+    """The most expensive model calls, to find the prompts worth trimming"""
+    df = pd.DataFrame(read_costliest_spans(COSTLIEST_CALLS), columns=COSTLIEST_CALLS_HEADERS)
+    return df.round({"Cost ($)": 5, "Latency (s)": 2})
+
+
+def make_metrics_ui():
+    with gr.Row():
+        trader_metrics = gr.Dataframe(
+            value=get_trader_metrics_df,
+            label="Token usage and cost by trader",
+            headers=TRADER_METRICS_HEADERS,
+            row_count=(4, "dynamic"),
+            col_count=len(TRADER_METRICS_HEADERS),
+            elem_classes=["dataframe-fix-small"],
+        )
+    with gr.Row():
+        costliest_calls = gr.Dataframe(
+            value=get_costliest_calls_df,
+            label="Costliest model calls",
+            headers=COSTLIEST_CALLS_HEADERS,
+            row_count=(5, "dynamic"),
+            col_count=len(COSTLIEST_CALLS_HEADERS),
+            max_height=300,
+            elem_classes=["dataframe-fix-small"],
         )
+    timer = gr.Timer(value=METRICS_REFRESH_SECONDS)
+    timer.tick(
+        fn=lambda: (get_trader_metrics_df(), get_costliest_calls_df()),
+        inputs=[],
+        outputs=[trader_metrics, costliest_calls],
+        show_progress="hidden",
+        queue=False,
+    )
 
 
 # Main UI construction
@@ -181,6 +277,7 @@ def create_ui():
         with gr.Row():
             for trader_view in trader_views:
                 trader_view.make_ui()
+        make_metrics_ui()
 
     return ui
 
@@ -0,0 +1,92 @@
+from accounts import Account, INITIAL_BALANCE
+from accounts_client import use_accounts_server_env, close_accounts_session
+from mcp_params import backtest_trader_mcp_server_params
+from mcp_pool import MCPServerPool
+from simulation import SimulatedClock, HistoricalPrices
+from traders import Trader
+import database
+import asyncio
+import os
+import tempfile
+import time
+
+
+class Backtest:
+    """
+    Replays the trading floor over a range of trading days as fast as the models allow.
+
+    The clock steps one trading day at a time and all the traders run that day concurrently against
+    the historical prices, then each account is valued at the day's close. The MCP servers are
+    started once for the whole replay, with the backtest settings and a saved copy of the price
+    store passed to them, so they share the simulated clock and prices with this process.
+    Given the same prices and a deterministic model, such as the stub, a replay is deterministic.
+    """
+
+    def __init__(self, traders: list[Trader], clock: SimulatedClock, prices: HistoricalPrices):
+        self.traders = traders
+        self.clock = clock
+        self.prices = prices
+        self.days: list[dict] = []
+        self.seconds = 0.0
+
+    async def run_day(self, day: str, mcp_pool: MCPServerPool) -> None:
+        started = time.perf_counter()
+        await asyncio.gather(*[trader.run(mcp_pool) for trader in self.traders])
+        values = {}
+        for trader in self.traders:
+            account = Account.get(trader.name)
+            account.report()
+            values[trader.name] = account.calculate_portfolio_value()
+        elapsed = time.perf_counter() - started
+        self.days.append({"day": day, "seconds": elapsed, "values": values})
+        summary = ", ".join(f"{name} ${value:,.2f}" for name, value in values.items())
+        print(f"{day} ({elapsed:.1f}s): {summary}")
+
+    async def run(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            prices_file = os.path.join(tmp, "prices.npz")
+            self.prices.save(prices_file)
+            env = {
+                "BACKTEST": "true",
+                "BACKTEST_DB": os.path.abspath(database.DB),
+                "BACKTEST_PRICES_FILE": prices_file,
+            }
+            use_accounts_server_env(env)
+            names = [trader.name for trader in self.traders]
+            mcp_pool = MCPServerPool(names, backtest_trader_mcp_server_params(env), research=False)
+            await mcp_pool.start()
+            started = time.perf_counter()
+            try:
+                for day in self.clock:
+                    await self.run_day(day, mcp_pool)
+            finally:
+                self.seconds = time.perf_counter() - started
+                await close_accounts_session()
+                await mcp_pool.close()
+
+    def get_results(self) -> list[dict]:
+        results = []
+        for trader in self.traders:
+            account = Account.get(trader.name)
+            value = account.calculate_portfolio_value()
+            results.append(
+                {
+                    "name": trader.name,
+                    "model": trader.model_name,
+                    "portfolio_value": value,
+                    "profit_loss": value - INITIAL_BALANCE,
+                    "return": (value - INITIAL_BALANCE) / INITIAL_BALANCE,
+                    "trades": len(account.transactions),
+                }
+            )
+        return sorted(results, key=lambda result: result["portfolio_value"], reverse=True)
+
+    def print_results(self) -> None:
+        days = len(self.days)
+        rate = days / self.seconds if self.seconds else 0.0
+        print(f"Replayed {days} trading days in {self.seconds:.1f}s ({rate:.2f} days/sec)")
+        for rank, result in enumerate(self.get_results(), start=1):
+            print(
+                f"{rank}. {result['name']} ({result['model']}): ${result['portfolio_value']:,.2f}, "
+                f"P&L ${result['profit_loss']:,.2f} ({result['return']:.2%}), {result['trades']} trades"
+            )
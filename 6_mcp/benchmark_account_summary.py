@@ -0,0 +1,81 @@
+"""
+Compare the size of the account context in the trader's prompt before and after summarizing it.
+
+A synthetic account trades a few times a day for up to two years, with rationales like the models
+write. For each history length it prints the tokens in the full account report, as sent before,
+and in the compact summary, with and without a token budget.
+Tokens are estimated at 4 characters each, as the rate limiter does.
+
+Run from the 6_mcp directory with: uv run benchmark_account_summary.py
+"""
+
+from account_summary import summarize_account, estimate_tokens
+from accounts import COST_BASIS_METHOD, INITIAL_BALANCE
+from positions import Ledger
+import json
+import random
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "SPY", "QQQ", "GLD", "TLT", "XLE"]
+HISTORY_LENGTHS = [50, 500, 2_000, 5_000]
+TOKEN_BUDGET = 1_000
+TRADES_PER_DAY = 7
+RATIONALE = (
+    "{verb} {symbol} after reviewing recent news and earnings: momentum and sector rotation support "
+    "this position within my strategy, and the risk is acceptable relative to the rest of the portfolio."
+)
+
+
+def make_account(trades: int, seed: int = 0) -> dict:
+    """An account report with the given number of transactions, as the accounts server returns it"""
+    rng = random.Random(seed)
+    balance = INITIAL_BALANCE
+    holdings = {}
+    transactions = []
+    ledger = Ledger(COST_BASIS_METHOD)
+    prices = {}
+    for index in range(trades):
+        symbol = rng.choice(SYMBOLS)
+        price = round(rng.uniform(50, 600), 2)
+        held = holdings.get(symbol, 0)
+        quantity = -rng.randint(1, held) if held and rng.random() < 0.4 else rng.randint(1, 20)
+        balance -= quantity * price
+        holdings[symbol] = held + quantity
+        ledger.apply(symbol, quantity, price)
+        prices[symbol] = price
+        if not holdings[symbol]:
+            del holdings[symbol]
+        day, slot = divmod(index, TRADES_PER_DAY)
+        transactions.append(
+            {
+                "symbol": symbol,
+                "quantity": quantity,
+                "price": price,
+                "timestamp": f"2024-{1 + day // 28 % 12:02d}-{1 + day % 28:02d} {10 + slot}:00:00",
+                "rationale": RATIONALE.format(verb="Buying" if quantity > 0 else "Selling", symbol=symbol),
+            }
+        )
+    return {
+        "name": "warren",
+        "balance": balance,
+        "strategy": "You are a value investor. " * 20,
+        "holdings": holdings,
+        "transactions": transactions,
+        "total_portfolio_value": INITIAL_BALANCE * 1.1,
+        "total_profit_loss": INITIAL_BALANCE * 0.1,
+        "positions": ledger.summary(prices),
+        "realized_profit_loss": ledger.realized_profit_loss(),
+    }
+
+
+def main():
+    print(f"{'Trades':>8} {'Full report':>12} {'Summary':>9} {f'Budget {TOKEN_BUDGET}':>12} {'Saved':>7}")
+    for trades in HISTORY_LENGTHS:
+        account = make_account(trades)
+        full = estimate_tokens(json.dumps(account))
+        summary = estimate_tokens(summarize_account(account, token_budget=None))
+        budgeted = estimate_tokens(summarize_account(account, token_budget=TOKEN_BUDGET))
+        print(f"{trades:>8} {full:>12,} {summary:>9,} {budgeted:>12,} {1 - summary / full:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
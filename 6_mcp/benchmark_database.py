@@ -0,0 +1,114 @@
+"""
+Benchmark the accounts database layer: ops/sec for the original code, with its connect-per-call
+pattern, JSON account rows and unindexed logs table, versus database.py as it is now, with its
+long-lived WAL connection, normalized account tables and logs index.
+
+Run from the 6_mcp directory with: uv run benchmark_database.py
+It works against throwaway databases in a temp directory and leaves accounts.db alone.
+"""
+
+import os
+import sqlite3
+import json
+import tempfile
+import time
+import database
+
+ITERATIONS = 2000
+
+ACCOUNT = {
+    "name": "warren",
+    "balance": 10_000.0,
+    "strategy": "Value investing",
+    "holdings": {"AAPL": 10, "MSFT": 5},
+    "transactions": [],
+    "portfolio_value_time_series": [],
+}
+
+
+LEGACY_WRITE_ACCOUNT_SQL = """
+    INSERT INTO accounts (name, account)
+    VALUES (?, ?)
+    ON CONFLICT(name) DO UPDATE SET account=excluded.account
+"""
+LEGACY_READ_ACCOUNT_SQL = "SELECT account FROM accounts WHERE name = ?"
+LEGACY_WRITE_LOG_SQL = """
+    INSERT INTO logs (name, datetime, type, message)
+    VALUES (?, datetime('now'), ?, ?)
+"""
+LEGACY_READ_LOG_SQL = """
+    SELECT datetime, type, message FROM logs
+    WHERE name = ?
+    ORDER BY datetime DESC
+    LIMIT ?
+"""
+
+
+class ConnectPerCall:
+    """The original implementation, with its SQL and unindexed tables: a fresh sqlite3.connect and a commit for every call"""
+
+    def __init__(self, db: str):
+        self.db = db
+        with sqlite3.connect(db) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS logs "
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, datetime DATETIME, type TEXT, message TEXT)"
+            )
+
+    def write_account(self, name, account_dict):
+        with sqlite3.connect(self.db) as conn:
+            conn.execute(LEGACY_WRITE_ACCOUNT_SQL, (name.lower(), json.dumps(account_dict)))
+            conn.commit()
+
+    def read_account(self, name):
+        with sqlite3.connect(self.db) as conn:
+            row = conn.execute(LEGACY_READ_ACCOUNT_SQL, (name.lower(),)).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def write_log(self, name, type, message):
+        with sqlite3.connect(self.db) as conn:
+            conn.execute(LEGACY_WRITE_LOG_SQL, (name.lower(), type, message))
+            conn.commit()
+
+    def read_log(self, name, last_n=10):
+        with sqlite3.connect(self.db) as conn:
+            return reversed(conn.execute(LEGACY_READ_LOG_SQL, (name.lower(), last_n)).fetchall())
+
+
+def measure(label: str, fn, iterations: int = ITERATIONS) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    ops = iterations / elapsed
+    print(f"  {label:<15} {ops:>12,.0f} ops/sec")
+    return ops
+
+
+def run_suite(impl) -> dict[str, float]:
+    return {
+        "write_account": measure("write_account", lambda i: impl.write_account("Warren", ACCOUNT)),
+        "read_account": measure("read_account", lambda i: impl.read_account("Warren")),
+        "write_log": measure("write_log", lambda i: impl.write_log("Warren", "trace", f"Span {i}")),
+        "read_log": measure("read_log", lambda i: list(impl.read_log("Warren", last_n=13))),
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        print("Before: connect per call")
+        before = run_suite(ConnectPerCall(os.path.join(tmp, "before.db")))
+
+        print("After: long-lived WAL connection")
+        database.DB = os.path.join(tmp, "after.db")
+        after = run_suite(database)
+        database.close_connections()
+
+    print("Speedup")
+    for op in before:
+        print(f"  {op:<15} {after[op] / before[op]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark read_log against a large logs table, with and without the (name, datetime) index,
+and time a compaction pass that archives the oldest entries.
+
+Run from the 6_mcp directory with: uv run benchmark_logs.py [rows]
+The default is 10 million rows spread across the four traders; building them takes a minute or two.
+It works against a throwaway database in a temp directory and leaves accounts.db alone.
+"""
+
+from datetime import datetime, timedelta
+import os
+import statistics
+import sys
+import tempfile
+import time
+import database
+from log_archive import compact_logs
+
+ROWS = 10_000_000
+NAMES = ["warren", "george", "ray", "cathie"]
+CHUNK = 100_000
+READS = 2000
+UNINDEXED_READS = 5
+
+
+def populate(rows: int) -> None:
+    start = datetime(2025, 1, 1)
+    for offset in range(0, rows, CHUNK):
+        entries = [
+            (NAMES[i % len(NAMES)], (start + timedelta(seconds=i // len(NAMES))).strftime("%Y-%m-%d %H:%M:%S"),
+             "function", f"Span {i}")
+            for i in range(offset, min(offset + CHUNK, rows))
+        ]
+        database.write_logs(entries)
+    database.get_connection().execute("ANALYZE")
+
+
+def time_reads(iterations: int) -> list[float]:
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        list(database.read_log(NAMES[i % len(NAMES)], last_n=13))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"  {label:<22} median {statistics.median(timings):8.3f}ms   p99 {p99:8.3f}ms")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB = os.path.join(tmp, "logs.db")
+        print(f"Writing {rows:,} log entries")
+        started = time.perf_counter()
+        populate(rows)
+        print(f"  took {time.perf_counter() - started:.1f}s")
+
+        print("read_log, last 13 entries")
+        report("with index", time_reads(READS))
+        conn = database.get_connection()
+        conn.execute("DROP INDEX idx_logs_name_datetime")
+        report("without index", time_reads(UNINDEXED_READS))
+        conn.execute("CREATE INDEX idx_logs_name_datetime ON logs (name, datetime)")
+
+        print("Compaction, keeping the newest 10% per trader")
+        started = time.perf_counter()
+        archived = compact_logs(
+            retention_days=0,
+            retention_rows=rows // len(NAMES) // 10,
+            archive_dir=os.path.join(tmp, "archive"),
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(archived.values())
+        print(f"  archived {total:,} entries in {elapsed:.1f}s ({total / elapsed:,.0f} entries/sec)")
+        report("with index, compacted", time_reads(READS))
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark the agents SDK itself, using the mock model server so no model is called.
+
+Each run is an agent that calls one tool and then answers, which is two model round trips.
+Runs go at several concurrency levels, first with an instant model (pure framework overhead)
+and then with simulated latency, to show how much the orchestration adds on top of the model.
+
+The mock server runs in the same process, so its own time is counted as framework time.
+
+Run from the 6_mcp directory with: uv run benchmark_mock_llm.py
+"""
+
+from agents import Agent, Runner, OpenAIChatCompletionsModel, function_tool, set_tracing_disabled
+from llm_dispatch import make_client
+from mock_llm import MockLLM, MockSettings
+import asyncio
+import time
+import uvicorn
+
+PORT = 8766
+RUNS = 200
+CONCURRENCY = [1, 10, 50]
+LATENCIES_MS = [0, 100]
+
+SCRIPT = [
+    {
+        "match": "Benchmark",
+        "steps": [
+            {"tool_calls": [{"name": "get_balance", "arguments": {"name": "Warren"}}], "completion_tokens": 20},
+            {"content": "The balance is 10000", "completion_tokens": 50},
+        ],
+    }
+]
+
+
+@function_tool
+def get_balance(name: str) -> float:
+    """Get the cash balance of the given account name."""
+    return 10_000.0
+
+
+async def run_agents(agent: Agent, runs: int, concurrency: int) -> tuple[float, float]:
+    """Returns the total seconds and the mean seconds per run"""
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+
+    async def run_one():
+        async with semaphore:
+            started = time.perf_counter()
+            await Runner.run(agent, "What is Warren's balance?")
+            durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[run_one() for _ in range(runs)])
+    return time.perf_counter() - started, sum(durations) / len(durations)
+
+
+async def main():
+    set_tracing_disabled(True)
+    mock = MockLLM(MockSettings(latency_ms=0), rules=SCRIPT)
+    server = uvicorn.Server(uvicorn.Config(mock.create_app(), port=PORT, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    client = make_client("mock", f"http://127.0.0.1:{PORT}/v1", "mock")
+    model = OpenAIChatCompletionsModel(model="mock", openai_client=client)
+    agent = Agent(name="Benchmark", instructions="Benchmark agent", model=model, tools=[get_balance])
+    await run_agents(agent, 5, 5)
+
+    try:
+        for latency_ms in LATENCIES_MS:
+            mock.settings.latency_ms = latency_ms
+            print(f"Model latency {latency_ms}ms per call")
+            for concurrency in CONCURRENCY:
+                elapsed, mean = await run_agents(agent, RUNS, concurrency)
+                print(
+                    f"  concurrency {concurrency:>3}: {RUNS / elapsed:8.1f} runs/sec, "
+                    f"{1000 * mean:7.1f}ms per run of which {2 * latency_ms}ms is the model"
+                )
+    finally:
+        server.should_exit = True
+        await serving
+    print(f"Mock server stats: {mock.stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,17 +1,79 @@
 import sqlite3
 import json
-from datetime import datetime
+import threading
+import atexit
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
 DB = "accounts.db"
 
+# Seconds a writer waits on a locked database before giving up
+BUSY_TIMEOUT = 10.0
 
-with sqlite3.connect(DB) as conn:
-    cursor = conn.cursor()
-    cursor.execute('CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)')
-    cursor.execute('''
+# How many distinct prepared statements each connection keeps compiled
+CACHED_STATEMENTS = 128
+
+# SQL is kept in module constants so that every call uses the identical string,
+# which is what lets sqlite3's statement cache reuse the prepared statement
+
+# Accounts are stored across normalized tables so that a trade is a few small inserts and updates,
+# however long the account's history. The original accounts table of one JSON blob per trader is
+# kept only as the source for the one-time migration in migrate_legacy_accounts.
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)",
+    """
+        CREATE TABLE IF NOT EXISTS account_details (
+            name TEXT PRIMARY KEY,
+            balance REAL,
+            strategy TEXT,
+            version INTEGER DEFAULT 0
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS holdings (
+            name TEXT,
+            symbol TEXT,
+            quantity INTEGER,
+            PRIMARY KEY (name, symbol)
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            symbol TEXT,
+            quantity INTEGER,
+            price REAL,
+            timestamp TEXT,
+            rationale TEXT
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_transactions_name ON transactions (name, id)",
+    """
+        CREATE TABLE IF NOT EXISTS portfolio_values (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            datetime TEXT,
+            value REAL
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_portfolio_values_name ON portfolio_values (name, id)",
+    """
+        CREATE TABLE IF NOT EXISTS portfolio_value_rollups (
+            name TEXT,
+            resolution TEXT,
+            bucket TEXT,
+            first_value REAL,
+            min_value REAL,
+            max_value REAL,
+            last_value REAL,
+            count INTEGER,
+            PRIMARY KEY (name, resolution, bucket)
+        )
+    """,
+    """
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT,
@@ -19,83 +81,681 @@ with sqlite3.connect(DB) as conn:
             type TEXT,
             message TEXT
         )
-    ''')
-    cursor.execute('CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)')
-    conn.commit()
-
-def write_account(name, account_dict):
-    json_data = json.dumps(account_dict)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO accounts (name, account)
-            VALUES (?, ?)
-            ON CONFLICT(name) DO UPDATE SET account=excluded.account
-        ''', (name.lower(), json_data))
-        conn.commit()
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_logs_name_id ON logs (name, id)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_name_datetime ON logs (name, datetime)",
+    "CREATE TABLE IF NOT EXISTS market (date TEXT PRIMARY KEY, data TEXT)",
+    """
+        CREATE TABLE IF NOT EXISTS market_prices (
+            tier TEXT,
+            symbol TEXT,
+            price REAL,
+            fetched REAL,
+            market_closed INTEGER,
+            PRIMARY KEY (tier, symbol)
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            scheduled DATETIME,
+            lag REAL,
+            duration REAL,
+            status TEXT
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_runs_name ON runs (name, id)",
+    "CREATE TABLE IF NOT EXISTS clock (id INTEGER PRIMARY KEY CHECK (id = 0), now TEXT)",
+    """
+        CREATE TABLE IF NOT EXISTS span_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            trace_id TEXT,
+            type TEXT,
+            agent TEXT,
+            model TEXT,
+            tool TEXT,
+            started DATETIME,
+            latency REAL,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            cached_tokens INTEGER,
+            cost REAL,
+            error TEXT
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_span_metrics_trace ON span_metrics (trace_id)",
+    "CREATE INDEX IF NOT EXISTS idx_span_metrics_cost ON span_metrics (cost)",
+    """
+        CREATE TABLE IF NOT EXISTS cycle_metrics (
+            trace_id TEXT PRIMARY KEY,
+            name TEXT,
+            workflow TEXT,
+            started DATETIME,
+            duration REAL,
+            model_calls INTEGER,
+            tool_calls INTEGER,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            cached_tokens INTEGER,
+            cost REAL
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cycle_metrics_name ON cycle_metrics (name, started)",
+]
+
+# Columns added to tables after they were first created, as (table, column, definition)
+ADDED_COLUMNS = [
+    ("account_details", "version", "INTEGER DEFAULT 0"),
+]
+
+# Every write to an account bumps its version, so readers can cheaply ask whether anything changed
+WRITE_ACCOUNT_DETAILS_SQL = """
+    INSERT INTO account_details (name, balance, strategy)
+    VALUES (?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        balance=excluded.balance, strategy=excluded.strategy, version=account_details.version + 1
+    RETURNING version
+"""
+# Only lands if the account is still at the version the writer read, so concurrent updates can't be lost
+WRITE_BALANCE_SQL = "UPDATE account_details SET balance = ?, version = version + 1 WHERE name = ? AND version = ?"
+WRITE_STRATEGY_SQL = "UPDATE account_details SET strategy = ?, version = version + 1 WHERE name = ? RETURNING version"
+BUMP_VERSION_SQL = "UPDATE account_details SET version = version + 1 WHERE name = ? RETURNING version"
+READ_VERSION_SQL = "SELECT version FROM account_details WHERE name = ?"
+READ_ACCOUNT_DETAILS_SQL = "SELECT balance, strategy, version FROM account_details WHERE name = ?"
+WRITE_HOLDING_SQL = """
+    INSERT INTO holdings (name, symbol, quantity)
+    VALUES (?, ?, ?)
+    ON CONFLICT(name, symbol) DO UPDATE SET quantity=excluded.quantity
+"""
+DELETE_HOLDING_SQL = "DELETE FROM holdings WHERE name = ? AND symbol = ?"
+READ_HOLDINGS_SQL = "SELECT symbol, quantity FROM holdings WHERE name = ? ORDER BY rowid"
+WRITE_TRANSACTION_SQL = """
+    INSERT INTO transactions (name, symbol, quantity, price, timestamp, rationale)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+READ_TRANSACTIONS_SQL = """
+    SELECT symbol, quantity, price, timestamp, rationale FROM transactions
+    WHERE name = ?
+    ORDER BY id
+"""
+WRITE_PORTFOLIO_VALUE_SQL = "INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)"
+READ_PORTFOLIO_VALUES_SQL = "SELECT datetime, value FROM portfolio_values WHERE name = ? ORDER BY id"
+COUNT_PORTFOLIO_VALUES_SQL = "SELECT COUNT(*) FROM portfolio_values WHERE name = ?"
+READ_ALL_PORTFOLIO_VALUES_SQL = "SELECT name, datetime, value FROM portfolio_values ORDER BY id"
+WRITE_ROLLUP_SQL = """
+    INSERT INTO portfolio_value_rollups
+        (name, resolution, bucket, first_value, min_value, max_value, last_value, count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(name, resolution, bucket) DO UPDATE SET
+        min_value=min(min_value, excluded.min_value),
+        max_value=max(max_value, excluded.max_value),
+        last_value=excluded.last_value,
+        count=count + excluded.count
+"""
+READ_ROLLUPS_SQL = """
+    SELECT bucket, first_value, min_value, max_value, last_value FROM portfolio_value_rollups
+    WHERE name = ? AND resolution = ?
+    ORDER BY bucket
+"""
+COUNT_ROLLUPS_SQL = "SELECT COUNT(*) FROM portfolio_value_rollups WHERE name = ? AND resolution = ?"
+HAS_ROLLUPS_SQL = "SELECT EXISTS (SELECT 1 FROM portfolio_value_rollups)"
+CLEAR_ACCOUNT_SQL = [
+    "DELETE FROM holdings WHERE name = ?",
+    "DELETE FROM transactions WHERE name = ?",
+    "DELETE FROM portfolio_values WHERE name = ?",
+    "DELETE FROM portfolio_value_rollups WHERE name = ?",
+]
+READ_LEGACY_ACCOUNTS_SQL = """
+    SELECT name, account FROM accounts
+    WHERE name NOT IN (SELECT name FROM account_details)
+"""
+WRITE_LOG_SQL = """
+    INSERT INTO logs (name, datetime, type, message)
+    VALUES (?, datetime('now'), ?, ?)
+"""
+WRITE_LOGS_SQL = """
+    INSERT INTO logs (name, datetime, type, message)
+    VALUES (?, ?, ?, ?)
+"""
+READ_LOG_SINCE_SQL = """
+    SELECT id, datetime, type, message FROM logs
+    WHERE name = ? AND id > ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+READ_LOG_SQL = """
+    SELECT datetime, type, message FROM logs
+    WHERE name = ?
+    ORDER BY datetime DESC, id DESC
+    LIMIT ?
+"""
+# Each step is an index seek, so this stays cheap however many rows each name has
+READ_LOG_NAMES_SQL = """
+    WITH RECURSIVE names(name) AS (
+        SELECT MIN(name) FROM logs
+        UNION ALL
+        SELECT (SELECT MIN(name) FROM logs WHERE name > names.name) FROM names WHERE name IS NOT NULL
+    )
+    SELECT name FROM names WHERE name IS NOT NULL
+"""
+LAST_LOG_ID_BEFORE_SQL = """
+    SELECT id FROM logs
+    WHERE name = ? AND datetime < ?
+    ORDER BY datetime DESC, id DESC
+    LIMIT 1
+"""
+LAST_LOG_ID_BEYOND_SQL = """
+    SELECT id FROM logs
+    WHERE name = ?
+    ORDER BY id DESC
+    LIMIT 1 OFFSET ?
+"""
+READ_OLD_LOGS_SQL = """
+    SELECT id, datetime, type, message FROM logs
+    WHERE name = ? AND id <= ?
+    ORDER BY id
+    LIMIT ?
+"""
+DELETE_OLD_LOGS_SQL = "DELETE FROM logs WHERE name = ? AND id <= ?"
+WRITE_MARKET_SQL = """
+    INSERT INTO market (date, data)
+    VALUES (?, ?)
+    ON CONFLICT(date) DO UPDATE SET data=excluded.data
+"""
+READ_MARKET_SQL = "SELECT data FROM market WHERE date = ?"
+READ_MARKET_RANGE_SQL = "SELECT date, data FROM market WHERE date BETWEEN ? AND ? ORDER BY date"
+WRITE_CLOCK_SQL = """
+    INSERT INTO clock (id, now) VALUES (0, ?)
+    ON CONFLICT(id) DO UPDATE SET now=excluded.now
+"""
+READ_CLOCK_SQL = "SELECT now FROM clock WHERE id = 0"
+WRITE_RUN_SQL = """
+    INSERT INTO runs (name, scheduled, lag, duration, status)
+    VALUES (?, ?, ?, ?, ?)
+"""
+READ_RUNS_SQL = """
+    SELECT scheduled, lag, duration, status FROM runs
+    WHERE name = ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+WRITE_PRICES_SQL = """
+    INSERT INTO market_prices (tier, symbol, price, fetched, market_closed)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(tier, symbol) DO UPDATE SET
+        price=excluded.price, fetched=excluded.fetched, market_closed=excluded.market_closed
+"""
+READ_PRICES_SQL = """
+    SELECT symbol, price, fetched, market_closed FROM market_prices
+    WHERE tier = ? AND symbol IN (SELECT value FROM json_each(?))
+"""
+WRITE_SPAN_METRICS_SQL = """
+    INSERT INTO span_metrics (
+        name, trace_id, type, agent, model, tool, started, latency,
+        input_tokens, output_tokens, cached_tokens, cost, error
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# A cycle is one trace, such as one Trader.run, rolled up from its spans when the trace ends
+WRITE_CYCLE_METRICS_SQL = """
+    INSERT OR REPLACE INTO cycle_metrics
+    SELECT ?, ?, ?, ?, ?,
+        COUNT(model),
+        COUNT(tool),
+        COALESCE(SUM(input_tokens), 0),
+        COALESCE(SUM(output_tokens), 0),
+        COALESCE(SUM(cached_tokens), 0),
+        COALESCE(SUM(cost), 0.0)
+    FROM span_metrics WHERE trace_id = ?
+"""
+READ_TRADER_METRICS_SQL = """
+    SELECT name, COUNT(*), SUM(model_calls), SUM(tool_calls), SUM(input_tokens), SUM(output_tokens),
+        SUM(cached_tokens), SUM(cost), AVG(duration)
+    FROM cycle_metrics
+    GROUP BY name
+    ORDER BY SUM(cost) DESC
+"""
+READ_CYCLE_METRICS_SQL = """
+    SELECT started, workflow, duration, model_calls, tool_calls, input_tokens, output_tokens,
+        cached_tokens, cost
+    FROM cycle_metrics
+    WHERE name = ?
+    ORDER BY started DESC
+    LIMIT ?
+"""
+READ_COSTLIEST_SPANS_SQL = """
+    SELECT name, agent, model, started, latency, input_tokens, output_tokens, cached_tokens, cost
+    FROM span_metrics
+    WHERE cost IS NOT NULL
+    ORDER BY cost DESC
+    LIMIT ?
+"""
+
+
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+
+
+def _configure(conn: sqlite3.Connection) -> None:
+    """Apply the pragmas that let several processes share accounts.db without locking each other out"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-8000")
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        add_missing_columns(conn)
+        migrate_legacy_accounts(conn)
+        backfill_rollups(conn)
+
+
+def add_missing_columns(conn: sqlite3.Connection) -> None:
+    for table, column, definition in ADDED_COLUMNS:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def migrate_legacy_accounts(conn: sqlite3.Connection) -> None:
+    """Copy any accounts still stored as a JSON blob in the accounts table into the normalized tables"""
+    for name, account in conn.execute(READ_LEGACY_ACCOUNTS_SQL).fetchall():
+        _write_account(conn, name, json.loads(account))
+
+
+def backfill_rollups(conn: sqlite3.Connection) -> None:
+    """Build the portfolio value rollups from the raw values the first time the rollups table is used"""
+    if conn.execute(HAS_ROLLUPS_SQL).fetchone()[0]:
+        return
+    for name, when, value in conn.execute(READ_ALL_PORTFOLIO_VALUES_SQL).fetchall():
+        _write_rollups(conn, name, when, value)
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return the long-lived connection for the current thread, opening it on first use.
+
+    Each thread gets its own connection (sqlite3 connections are not safe to share across threads),
+    so an MCP server process holds one and the Gradio app holds one per worker thread.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "db", None) != DB:
+        conn = sqlite3.connect(DB, timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS)
+        _configure(conn)
+        _local.conn = conn
+        _local.db = DB
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def close_connections() -> None:
+    """Close every connection opened by this process; called automatically at exit"""
+    with _connections_lock:
+        while _connections:
+            try:
+                _connections.pop().close()
+            except sqlite3.ProgrammingError:
+                pass
+    _local.conn = None
+
+
+atexit.register(close_connections)
+
+
+def _write_account(conn: sqlite3.Connection, name: str, account_dict: dict) -> int:
+    name = name.lower()
+    version = conn.execute(WRITE_ACCOUNT_DETAILS_SQL, (name, account_dict["balance"], account_dict["strategy"])).fetchone()[0]
+    for statement in CLEAR_ACCOUNT_SQL:
+        conn.execute(statement, (name,))
+    conn.executemany(
+        WRITE_HOLDING_SQL,
+        [(name, symbol, quantity) for symbol, quantity in account_dict["holdings"].items()],
+    )
+    conn.executemany(
+        WRITE_TRANSACTION_SQL,
+        [
+            (name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"])
+            for t in account_dict["transactions"]
+        ],
+    )
+    for when, value in account_dict.get("portfolio_value_time_series", []):
+        conn.execute(WRITE_PORTFOLIO_VALUE_SQL, (name, when, value))
+        _write_rollups(conn, name, when, value)
+    return version
+
+def write_account(name, account_dict) -> int:
+    """
+    Replace the whole of an account; used when creating or resetting one. Returns its new version.
+    Day to day changes should use the incremental writers below, whose cost doesn't grow with history.
+    """
+    conn = get_connection()
+    with conn:
+        return _write_account(conn, name, account_dict)
 
 def read_account(name):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT account FROM accounts WHERE name = ?', (name.lower(),))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
-    
+    name = name.lower()
+    conn = get_connection()
+    row = conn.execute(READ_ACCOUNT_DETAILS_SQL, (name,)).fetchone()
+    if not row:
+        return None
+    balance, strategy, version = row
+    transactions = conn.execute(READ_TRANSACTIONS_SQL, (name,)).fetchall()
+    return {
+        "name": name,
+        "balance": balance,
+        "strategy": strategy,
+        "version": version,
+        "holdings": dict(conn.execute(READ_HOLDINGS_SQL, (name,)).fetchall()),
+        "transactions": [
+            {"symbol": symbol, "quantity": quantity, "price": price, "timestamp": timestamp, "rationale": rationale}
+            for symbol, quantity, price, timestamp, rationale in transactions
+        ],
+    }
+
+def write_strategy(name: str, strategy: str) -> int | None:
+    """Change an account's strategy, returning its new version"""
+    conn = get_connection()
+    with conn:
+        row = conn.execute(WRITE_STRATEGY_SQL, (strategy, name.lower())).fetchone()
+    return row[0] if row else None
+
+def write_account_changes(
+    name: str, version: int, balance: float, holdings: dict[str, int], transactions: list[dict]
+) -> bool:
+    """
+    Apply a change to an account atomically, provided no one else has changed it since it was read.
+
+    Args:
+        name (str): The account to change
+        version (int): The version of the account the change was worked out from
+        balance (float): The new cash balance
+        holdings (dict): The new quantity of each symbol whose holding changed; zero removes it
+        transactions (list): The transactions to record, as dicts
+
+    Returns:
+        bool: True if the change was applied, False if the account had moved on to a newer version
+    """
+    name = name.lower()
+    conn = get_connection()
+    with conn:
+        if conn.execute(WRITE_BALANCE_SQL, (balance, name, version)).rowcount == 0:
+            return False
+        conn.executemany(
+            WRITE_HOLDING_SQL, [(name, symbol, quantity) for symbol, quantity in holdings.items() if quantity]
+        )
+        conn.executemany(
+            DELETE_HOLDING_SQL, [(name, symbol) for symbol, quantity in holdings.items() if not quantity]
+        )
+        conn.executemany(
+            WRITE_TRANSACTION_SQL,
+            [(name, t["symbol"], t["quantity"], t["price"], t["timestamp"], t["rationale"]) for t in transactions],
+        )
+    return True
+
+# Portfolio values are kept raw and rolled up into buckets of each resolution, keyed by a prefix
+# of the 'YYYY-MM-DD HH:MM:SS' timestamp, so charts over long histories read a bounded number of rows
+ROLLUP_RESOLUTIONS = {
+    "minute": lambda when: when[:16],
+    "hour": lambda when: when[:13] + ":00",
+    "day": lambda when: when[:10],
+}
+
+def _write_rollups(conn: sqlite3.Connection, name: str, datetime: str, value: float) -> None:
+    conn.executemany(
+        WRITE_ROLLUP_SQL,
+        [
+            (name, resolution, bucket(datetime), value, value, value, value, 1)
+            for resolution, bucket in ROLLUP_RESOLUTIONS.items()
+        ],
+    )
+
+def write_portfolio_value(name: str, datetime: str, value: float) -> int | None:
+    """Record a portfolio value, returning the account's new version"""
+    name = name.lower()
+    conn = get_connection()
+    with conn:
+        conn.execute(WRITE_PORTFOLIO_VALUE_SQL, (name, datetime, value))
+        _write_rollups(conn, name, datetime, value)
+        row = conn.execute(BUMP_VERSION_SQL, (name,)).fetchone()
+    return row[0] if row else None
+
+def count_portfolio_values(name: str, resolution: str | None = None) -> int:
+    """Count the raw portfolio values for an account, or its buckets at the given rollup resolution"""
+    conn = get_connection()
+    if resolution:
+        return conn.execute(COUNT_ROLLUPS_SQL, (name.lower(), resolution)).fetchone()[0]
+    return conn.execute(COUNT_PORTFOLIO_VALUES_SQL, (name.lower(),)).fetchone()[0]
+
+def read_portfolio_values(name: str) -> list[tuple[str, float]]:
+    """Read every raw (datetime, value) portfolio value for an account, oldest first"""
+    conn = get_connection()
+    return conn.execute(READ_PORTFOLIO_VALUES_SQL, (name.lower(),)).fetchall()
+
+def read_portfolio_value_rollups(name: str, resolution: str) -> list[tuple[str, float, float, float, float]]:
+    """Read (bucket, first, min, max, last) portfolio values at a rollup resolution, oldest first"""
+    conn = get_connection()
+    return conn.execute(READ_ROLLUPS_SQL, (name.lower(), resolution)).fetchall()
+
+def read_account_version(name: str) -> int | None:
+    """Return a number that changes whenever the account does, or None if there is no such account"""
+    conn = get_connection()
+    row = conn.execute(READ_VERSION_SQL, (name.lower(),)).fetchone()
+    return row[0] if row else None
+
 def write_log(name: str, type: str, message: str):
     """
     Write a log entry to the logs table.
-    
+
     Args:
         name (str): The name associated with the log
         type (str): The type of log entry
         message (str): The log message
     """
-    now = datetime.now().isoformat()
-    
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO logs (name, datetime, type, message)
-            VALUES (?, datetime('now'), ?, ?)
-        ''', (name.lower(), type, message))
-        conn.commit()
+    conn = get_connection()
+    with conn:
+        conn.execute(WRITE_LOG_SQL, (name.lower(), type, message))
+
+def write_logs(entries: list[tuple[str, str, str, str]]):
+    """
+    Write a batch of log entries to the logs table in a single transaction.
+
+    Args:
+        entries (list): Tuples of (name, datetime, type, message), with datetime in SQLite's
+            'YYYY-MM-DD HH:MM:SS' UTC format to match entries written by write_log
+    """
+    if not entries:
+        return
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            WRITE_LOGS_SQL,
+            [(name.lower(), when, type, message) for name, when, type, message in entries],
+        )
 
 def read_log(name: str, last_n=10):
     """
     Read the most recent log entries for a given name.
-    
+
     Args:
         name (str): The name to retrieve logs for
         last_n (int): Number of most recent entries to retrieve
-        
+
     Returns:
         list: A list of tuples containing (datetime, type, message)
     """
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT datetime, type, message FROM logs 
-            WHERE name = ? 
-            ORDER BY datetime DESC
-            LIMIT ?
-        ''', (name.lower(), last_n))
-        
-        return reversed(cursor.fetchall())
+    conn = get_connection()
+    rows = conn.execute(READ_LOG_SQL, (name.lower(), last_n)).fetchall()
+    return reversed(rows)
+
+def read_log_since(name: str, last_id: int = 0, last_n=10):
+    """
+    Read log entries for a given name written after the entry with id last_id.
+
+    Args:
+        name (str): The name to retrieve logs for
+        last_id (int): The id of the last entry already seen; 0 to start from the beginning
+        last_n (int): The most entries to return; if there are more, only the newest are returned
+
+    Returns:
+        list: A list of tuples containing (id, datetime, type, message), oldest first
+    """
+    conn = get_connection()
+    rows = conn.execute(READ_LOG_SINCE_SQL, (name.lower(), last_id, last_n)).fetchall()
+    return list(reversed(rows))
+
+def read_log_names() -> list[str]:
+    """Every name with entries in the logs table"""
+    conn = get_connection()
+    return [row[0] for row in conn.execute(READ_LOG_NAMES_SQL).fetchall()]
+
+def find_expired_log_id(name: str, before: str | None = None, keep: int | None = None) -> int:
+    """
+    Find the id of the newest log entry for a name that falls outside the retention policy.
+
+    Args:
+        name (str): The name whose logs are being retired
+        before (str): Entries dated before this 'YYYY-MM-DD HH:MM:SS' UTC time have expired
+        keep (int): Only this many of the most recent entries are kept
+
+    Returns:
+        int: Entries with this id or lower have expired; 0 if none have
+    """
+    conn = get_connection()
+    expired = 0
+    if before:
+        row = conn.execute(LAST_LOG_ID_BEFORE_SQL, (name.lower(), before)).fetchone()
+        expired = max(expired, row[0] if row else 0)
+    if keep:
+        row = conn.execute(LAST_LOG_ID_BEYOND_SQL, (name.lower(), keep)).fetchone()
+        expired = max(expired, row[0] if row else 0)
+    return expired
+
+def read_old_logs(name: str, up_to_id: int, limit: int):
+    """Read the oldest log entries for a name with ids up to up_to_id, as (id, datetime, type, message)"""
+    conn = get_connection()
+    return conn.execute(READ_OLD_LOGS_SQL, (name.lower(), up_to_id, limit)).fetchall()
+
+def delete_old_logs(name: str, up_to_id: int) -> int:
+    """Delete the log entries for a name with ids up to up_to_id; returns how many were deleted"""
+    conn = get_connection()
+    with conn:
+        return conn.execute(DELETE_OLD_LOGS_SQL, (name.lower(), up_to_id)).rowcount
 
 def write_market(date: str, data: dict) -> None:
     data_json = json.dumps(data)
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO market (date, data)
-            VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET data=excluded.data
-        ''', (date, data_json))
-        conn.commit()
+    conn = get_connection()
+    with conn:
+        conn.execute(WRITE_MARKET_SQL, (date, data_json))
 
 def read_market(date: str) -> dict | None:
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT data FROM market WHERE date = ?', (date,))
-        row = cursor.fetchone()
-        return json.loads(row[0]) if row else None
\ No newline at end of file
+    conn = get_connection()
+    row = conn.execute(READ_MARKET_SQL, (date,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def read_market_range(start: str, end: str) -> list[tuple[str, dict]]:
+    """Read the stored market data for every date from start to end inclusive, as (date, data) in date order"""
+    conn = get_connection()
+    return [(date, json.loads(data)) for date, data in conn.execute(READ_MARKET_RANGE_SQL, (start, end))]
+
+def write_clock(now: str) -> None:
+    """Set the simulated time shared by every process using this database during a backtest"""
+    conn = get_connection()
+    with conn:
+        conn.execute(WRITE_CLOCK_SQL, (now,))
+
+def read_clock() -> str | None:
+    """The simulated 'YYYY-MM-DD HH:MM:SS' time, or None if no backtest has set one"""
+    conn = get_connection()
+    row = conn.execute(READ_CLOCK_SQL).fetchone()
+    return row[0] if row else None
+
+def write_prices(tier: str, prices: list[tuple[str, float, float, bool]]) -> None:
+    """
+    Store the latest prices for a tier of market data.
+
+    Args:
+        tier (str): The kind of market data, such as realtime, delayed or eod
+        prices (list): Tuples of (symbol, price, fetched epoch seconds, whether the market was closed)
+    """
+    if not prices:
+        return
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            WRITE_PRICES_SQL,
+            [(tier, symbol, price, fetched, int(closed)) for symbol, price, fetched, closed in prices],
+        )
+
+def read_prices(tier: str, symbols: list[str]) -> dict[str, tuple[float, float, bool]]:
+    conn = get_connection()
+    rows = conn.execute(READ_PRICES_SQL, (tier, json.dumps(symbols))).fetchall()
+    return {symbol: (price, fetched, bool(closed)) for symbol, price, fetched, closed in rows}
+
+def write_run(name: str, scheduled: str, lag: float, duration: float, status: str) -> None:
+    """
+    Record one scheduled run of a trader.
+
+    Args:
+        name (str): The trader
+        scheduled (str): When the run was due, as a UTC datetime
+        lag (float): Seconds between when the run was due and when it started
+        duration (float): Seconds the run took
+        status (str): How the run ended, such as completed, timed out or skipped
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute(WRITE_RUN_SQL, (name.lower(), scheduled, lag, duration, status))
+
+def read_runs(name: str, last_n=10):
+    """
+    Read the most recent runs for a trader, oldest first, as tuples of (scheduled, lag, duration, status)
+    """
+    conn = get_connection()
+    rows = conn.execute(READ_RUNS_SQL, (name.lower(), last_n)).fetchall()
+    return reversed(rows)
+
+def write_metrics(spans: list[tuple], cycles: list[tuple]) -> None:
+    """
+    Write a batch of span metrics, then roll up the cycles that have ended, in a single transaction.
+
+    Args:
+        spans (list): Tuples of (name, trace_id, type, agent, model, tool, started, latency,
+            input_tokens, output_tokens, cached_tokens, cost, error); model is set for model calls
+            and tool for tool calls
+        cycles (list): Tuples of (trace_id, name, workflow, started, duration) for traces that have ended,
+            written after all of their spans
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany(WRITE_SPAN_METRICS_SQL, [(span[0].lower(), *span[1:]) for span in spans])
+        for trace_id, name, workflow, started, duration in cycles:
+            conn.execute(WRITE_CYCLE_METRICS_SQL, (trace_id, name.lower(), workflow, started, duration, trace_id))
+
+def read_trader_metrics() -> list[tuple]:
+    """
+    Totals across all cycles for each name, costliest first, as tuples of (name, cycles, model_calls,
+    tool_calls, input_tokens, output_tokens, cached_tokens, cost, mean_duration)
+    """
+    conn = get_connection()
+    return conn.execute(READ_TRADER_METRICS_SQL).fetchall()
+
+def read_cycle_metrics(name: str, last_n=10) -> list[tuple]:
+    """
+    The most recent cycles for a name, newest first, as tuples of (started, workflow, duration,
+    model_calls, tool_calls, input_tokens, output_tokens, cached_tokens, cost)
+    """
+    conn = get_connection()
+    return conn.execute(READ_CYCLE_METRICS_SQL, (name.lower(), last_n)).fetchall()
+
+def read_costliest_spans(last_n=10) -> list[tuple]:
+    """
+    The most expensive model calls, as tuples of (name, agent, model, started, latency,
+    input_tokens, output_tokens, cached_tokens, cost)
+    """
+    conn = get_connection()
+    return conn.execute(READ_COSTLIEST_SPANS_SQL, (last_n,)).fetchall()
@@ -0,0 +1,251 @@
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+import asyncio
+import httpx
+import json
+import os
+import random
+import time
+
+# Default limits per provider: requests per minute, tokens per minute and concurrent requests.
+# Override any of them with <PROVIDER>_RPM, <PROVIDER>_TPM and <PROVIDER>_MAX_CONCURRENCY
+PROVIDER_LIMITS = {
+    "openai": (500, 200_000, 8),
+    "openrouter": (200, 200_000, 8),
+    "deepseek": (60, 100_000, 4),
+    "grok": (60, 100_000, 4),
+    "gemini": (60, 250_000, 4),
+    # The local mock server from mock_llm.py, limited only so that load tests still exercise the limiter
+    "mock": (1_000_000, 1_000_000_000, 64),
+}
+
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHARS_PER_TOKEN = 4
+
+# Called with the usage of every completed response, e.g. by the metrics tracer for cached prompt tokens
+usage_listeners: list = []
+
+
+class TokenBucket:
+    """Allows up to capacity units per minute, refilled continuously; callers wait their turn in order"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Take amount units, waiting until they are available; returns the seconds spent waiting"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self.lock:
+            self.refill()
+            while self.tokens < amount:
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self.refill()
+            self.tokens -= amount
+        return waited
+
+    def adjust(self, amount: float) -> None:
+        """Correct an earlier estimate; a positive amount is charged, a negative one refunded"""
+        self.refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+@dataclass
+class ProviderStats:
+    requests: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    failures: int = 0
+    in_flight: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    queue_seconds: float = 0.0
+    latency_seconds: float = 0.0
+    statuses: dict[int, int] = field(default_factory=dict)
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.stats = ProviderStats()
+
+
+def get_cached_tokens(usage: dict) -> int:
+    """The prompt tokens a response says were served from the provider's prompt cache"""
+    details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+    # DeepSeek reports its cache hits separately
+    return details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0
+
+
+def backoff(attempt: int) -> float:
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+    return delay * (0.5 + random.random() / 2)
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Honor retry-after-ms or Retry-After (in seconds or as an HTTP date), else back off exponentially"""
+    retry_after_ms = response.headers.get("retry-after-ms")
+    retry_after = response.headers.get("retry-after")
+    try:
+        if retry_after_ms:
+            return float(retry_after_ms) / 1000
+        if retry_after:
+            return float(retry_after)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return backoff(attempt)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    An httpx transport that sends each request through its provider's limiter: it waits for request
+    and token budget, holds a concurrency slot while the request is in flight, and retries rate limits
+    and server errors with backoff, honoring Retry-After. Retries don't take budget again, and the
+    token estimate is refunded if the request never gets a response with its usage.
+    """
+
+    def __init__(self, limiter: ProviderLimiter, transport: httpx.AsyncBaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    @staticmethod
+    def estimate_tokens(request: httpx.Request) -> int:
+        return len(request.content) // CHARS_PER_TOKEN
+
+    def record_usage(self, response: httpx.Response, estimate: int) -> None:
+        try:
+            usage = json.loads(response.content).get("usage") or {}
+        except (ValueError, AttributeError, httpx.ResponseNotRead):
+            return
+        input_tokens = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+        output_tokens = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+        self.limiter.stats.input_tokens += input_tokens
+        self.limiter.stats.output_tokens += output_tokens
+        self.limiter.stats.cached_tokens += get_cached_tokens(usage)
+        self.limiter.tokens.adjust(input_tokens + output_tokens - estimate)
+        for listener in usage_listeners:
+            listener(usage)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiter
+        stats = limiter.stats
+        estimate = self.estimate_tokens(request)
+        streaming = b'"stream":true' in request.content.replace(b" ", b"")
+        # The request and token budget are taken once, however many attempts the request needs
+        start = time.monotonic()
+        await limiter.requests.acquire(1)
+        await limiter.tokens.acquire(estimate)
+        for attempt in range(MAX_RETRIES + 1):
+            async with limiter.semaphore:
+                stats.queue_seconds += time.monotonic() - start
+                stats.requests += 1
+                stats.in_flight += 1
+                sent = time.monotonic()
+                try:
+                    response = await self.transport.handle_async_request(request)
+                    if not streaming and response.status_code not in RETRY_STATUSES:
+                        await response.aread()
+                except httpx.TransportError:
+                    stats.failures += 1
+                    if attempt == MAX_RETRIES:
+                        limiter.tokens.adjust(-estimate)
+                        raise
+                    response = None
+                finally:
+                    stats.in_flight -= 1
+                    stats.latency_seconds += time.monotonic() - sent
+            if response is None:
+                stats.retries += 1
+                await asyncio.sleep(backoff(attempt))
+                start = time.monotonic()
+                continue
+            stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                if response.status_code in RETRY_STATUSES:
+                    limiter.tokens.adjust(-estimate)
+                elif not streaming:
+                    self.record_usage(response, estimate)
+                return response
+            if response.status_code == 429:
+                stats.rate_limited += 1
+            stats.retries += 1
+            delay = retry_delay(response, attempt)
+            await response.aclose()
+            await asyncio.sleep(delay)
+            start = time.monotonic()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def provider_limits(provider: str) -> tuple[int, int, int]:
+    rpm, tpm, concurrency = PROVIDER_LIMITS[provider]
+    prefix = provider.upper()
+    return (
+        int(os.getenv(f"{prefix}_RPM", rpm)),
+        int(os.getenv(f"{prefix}_TPM", tpm)),
+        int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrency)),
+    )
+
+
+limiters: dict[str, ProviderLimiter] = {}
+
+
+def make_client(provider: str, base_url: str | None = None, api_key: str | None = None) -> AsyncOpenAI:
+    """
+    An AsyncOpenAI client for the provider whose requests go through its shared limiter and a
+    pooled HTTP connection; the SDK's own retries are switched off as the transport handles them.
+    """
+    rpm, tpm, concurrency = provider_limits(provider)
+    limiter = limiters.setdefault(provider, ProviderLimiter(provider, rpm, tpm, concurrency))
+    pool = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency)
+    )
+    http_client = DefaultAsyncHttpxClient(transport=RateLimitedTransport(limiter, pool))
+    return AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def get_usage_stats() -> dict[str, dict]:
+    """Requests, retries, rate limits, tokens, prompt cache hits and mean queue wait and latency for each provider"""
+    usage = {}
+    for provider, limiter in limiters.items():
+        stats = limiter.stats
+        usage[provider] = {
+            "requests": stats.requests,
+            "retries": stats.retries,
+            "rate_limited": stats.rate_limited,
+            "failures": stats.failures,
+            "in_flight": stats.in_flight,
+            "max_concurrency": limiter.max_concurrency,
+            "input_tokens": stats.input_tokens,
+            "output_tokens": stats.output_tokens,
+            "cached_tokens": stats.cached_tokens,
+            "cache_hit_rate": stats.cached_tokens / stats.input_tokens if stats.input_tokens else 0.0,
+            "mean_queue_ms": 1000 * stats.queue_seconds / stats.requests if stats.requests else 0.0,
+            "mean_latency_ms": 1000 * stats.latency_seconds / stats.requests if stats.requests else 0.0,
+            "statuses": dict(stats.statuses),
+        }
+    return usage
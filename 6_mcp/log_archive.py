@@ -0,0 +1,106 @@
+"""
+Retention and compaction for the logs table.
+
+Entries older than LOG_RETENTION_DAYS, or beyond the newest LOG_RETENTION_ROWS for each trader,
+are moved out of accounts.db into gzipped JSON lines files under LOG_ARCHIVE_DIR, one file per
+batch named by its first and last log id. Set either limit to 0 to switch it off.
+
+Runs in the background of the trading floor, or once with: uv run log_archive.py
+"""
+
+from database import read_log_names, find_expired_log_id, read_old_logs, delete_old_logs
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+import gzip
+import json
+import os
+import threading
+
+load_dotenv(override=True)
+
+LOG_RETENTION_DAYS = float(os.getenv("LOG_RETENTION_DAYS", "7"))
+LOG_RETENTION_ROWS = int(os.getenv("LOG_RETENTION_ROWS", "100000"))
+LOG_COMPACT_MINUTES = float(os.getenv("LOG_COMPACT_MINUTES", "60"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "logs_archive")
+LOG_ARCHIVE_BATCH = 50_000
+
+
+def archive_batch(name: str, rows: list[tuple], archive_dir: str) -> str:
+    """Write rows to a compressed file, via a temporary file so a partial archive is never left behind"""
+    folder = os.path.join(archive_dir, name)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{rows[0][0]:012d}-{rows[-1][0]:012d}.jsonl.gz")
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+        for id, when, type, message in rows:
+            f.write(json.dumps({"id": id, "datetime": when, "type": type, "message": message}) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def compact_logs(
+    retention_days: float = LOG_RETENTION_DAYS,
+    retention_rows: int = LOG_RETENTION_ROWS,
+    archive_dir: str = LOG_ARCHIVE_DIR,
+    batch_size: int = LOG_ARCHIVE_BATCH,
+) -> dict[str, int]:
+    """Archive and delete expired log entries for every name; returns how many were moved for each"""
+    before = None
+    if retention_days:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        before = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    archived = {}
+    for name in read_log_names():
+        expired = find_expired_log_id(name, before=before, keep=retention_rows)
+        count = 0
+        while expired and (rows := read_old_logs(name, expired, batch_size)):
+            archive_batch(name, rows, archive_dir)
+            # Ids for a name only grow, so the batch is everything up to its last id
+            count += delete_old_logs(name, rows[-1][0])
+        if count:
+            archived[name] = count
+    return archived
+
+
+def read_archived_logs(name: str, archive_dir: str = LOG_ARCHIVE_DIR):
+    """Yield the archived entries for a name, oldest first, as (id, datetime, type, message)"""
+    folder = os.path.join(archive_dir, name.lower())
+    if not os.path.isdir(folder):
+        return
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith(".jsonl.gz"):
+            with gzip.open(os.path.join(folder, filename), "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    yield entry["id"], entry["datetime"], entry["type"], entry["message"]
+
+
+class LogCompactor:
+    """Runs compact_logs every LOG_COMPACT_MINUTES from a background thread, off the event loop"""
+
+    def __init__(self, every_minutes: float = LOG_COMPACT_MINUTES):
+        self.every_seconds = every_minutes * 60
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="log-compactor", daemon=True)
+
+    def start(self) -> None:
+        if self.every_seconds > 0:
+            self.thread.start()
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                for name, count in compact_logs().items():
+                    print(f"Archived {count:,} log entries for {name}")
+            except Exception as e:
+                print(f"Log compaction failed: {e}")
+            self.stopped.wait(self.every_seconds)
+
+    def close(self) -> None:
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+if __name__ == "__main__":
+    archived = compact_logs()
+    print(f"Archived {sum(archived.values()):,} log entries to {LOG_ARCHIVE_DIR}")
@@ -4,8 +4,11 @@ import os
 from datetime import datetime
 import random
 from database import write_market, read_market
+from price_cache import PriceCache
+from simulation import BACKTEST, get_backtest_share_prices
 from functools import lru_cache
 from datetime import timezone
+import time
 
 load_dotenv(override=True)
 
@@ -15,16 +18,31 @@ polygon_plan = os.getenv("POLYGON_PLAN")
 is_paid_polygon = polygon_plan == "paid"
 is_realtime_polygon = polygon_plan == "realtime"
 
+# The market status is rechecked at most this often
+MARKET_STATUS_SECONDS = 5 * 60
+
+market_status = {"open": False, "checked": None}
+
+
+@lru_cache(maxsize=1)
+def get_client() -> RESTClient:
+    return RESTClient(polygon_api_key)
+
 
 def is_market_open() -> bool:
-    client = RESTClient(polygon_api_key)
-    market_status = client.get_market_status()
-    return market_status.market == "open"
+    if BACKTEST:
+        return True
+    now = time.monotonic()
+    if market_status["checked"] is None or now - market_status["checked"] > MARKET_STATUS_SECONDS:
+        client = get_client()
+        market_status["open"] = client.get_market_status().market == "open"
+        market_status["checked"] = now
+    return market_status["open"]
 
 
 def get_all_share_prices_polygon_eod() -> dict[str, float]:
     """With much thanks to student Reema R. for fixing the timezone issue with this!"""
-    client = RESTClient(polygon_api_key)
+    client = get_client()
 
     probe = client.get_previous_close_agg("SPY")[0]
     last_close = datetime.fromtimestamp(probe.timestamp / 1000, tz=timezone.utc).date()
@@ -42,29 +60,52 @@ def get_market_for_prior_date(today):
     return market_data
 
 
-def get_share_price_polygon_eod(symbol) -> float:
+def get_share_prices_polygon_eod(symbols) -> dict[str, float]:
     today = datetime.now().date().strftime("%Y-%m-%d")
     market_data = get_market_for_prior_date(today)
-    return market_data.get(symbol, 0.0)
+    return {symbol: market_data.get(symbol, 0.0) for symbol in symbols}
 
 
-def get_share_price_polygon_min(symbol) -> float:
-    client = RESTClient(polygon_api_key)
-    result = client.get_snapshot_ticker("stocks", symbol)
-    return result.min.close or result.prev_day.close
+def get_share_prices_polygon_min(symbols) -> dict[str, float]:
+    """Fetch the latest minute close for all the symbols with one grouped snapshot request"""
+    results = get_client().get_snapshot_all("stocks", tickers=list(symbols))
+    prices = {symbol: 0.0 for symbol in symbols}
+    for result in results:
+        minute_close = result.min.close if result.min else None
+        prev_close = result.prev_day.close if result.prev_day else None
+        prices[result.ticker] = minute_close or prev_close or 0.0
+    return prices
 
 
-def get_share_price_polygon(symbol) -> float:
+def get_share_prices_polygon(symbols) -> dict[str, float]:
     if is_paid_polygon:
-        return get_share_price_polygon_min(symbol)
+        return get_share_prices_polygon_min(symbols)
     else:
-        return get_share_price_polygon_eod(symbol)
+        return get_share_prices_polygon_eod(symbols)
 
 
-def get_share_price(symbol) -> float:
+if is_realtime_polygon:
+    price_tier = "realtime"
+elif is_paid_polygon:
+    price_tier = "delayed"
+else:
+    price_tier = "eod"
+
+price_cache = PriceCache(price_tier, get_share_prices_polygon, is_market_open)
+
+
+def get_share_prices(symbols) -> dict[str, float]:
+    """Price several symbols at once from the price cache, fetching any stale ones in one upstream call"""
+    symbols = list(dict.fromkeys(symbols))
+    if BACKTEST:
+        return get_backtest_share_prices(symbols)
     if polygon_api_key:
         try:
-            return get_share_price_polygon(symbol)
+            return price_cache.get_many(symbols)
         except Exception as e:
             print(f"Was not able to use the polygon API due to {e}; using a random number")
-    return float(random.randint(1, 100))
+    return {symbol: float(random.randint(1, 100)) for symbol in symbols}
+
+
+def get_share_price(symbol) -> float:
+    return get_share_prices([symbol])[symbol]
@@ -27,20 +27,35 @@ trader_mcp_server_params = [
     market_mcp,
 ]
 
+# For a backtest: the local accounts and market servers, with the backtest settings passed through,
+# and no push notifications
+
+def backtest_trader_mcp_server_params(env: dict[str, str]):
+    return [
+        {"command": "uv", "args": ["run", "accounts_server.py"], "env": env},
+        {"command": "uv", "args": ["run", "market_server.py"], "env": env},
+    ]
+
 # The full set of MCP servers for the researcher: Fetch, Brave Search and Memory
+# Fetch and Brave Search are stateless and can be shared; the Memory server is specific to each trader
+
+researcher_shared_mcp_server_params = [
+    {"command": "uvx", "args": ["mcp-server-fetch"]},
+    {
+        "command": "npx",
+        "args": ["-y", "@modelcontextprotocol/server-brave-search"],
+        "env": brave_env,
+    },
+]
+
+
+def researcher_memory_mcp_server_params(name: str):
+    return {
+        "command": "npx",
+        "args": ["-y", "mcp-memory-libsql"],
+        "env": {"LIBSQL_URL": f"file:./memory/{name}.db"},
+    }
 
 
 def researcher_mcp_server_params(name: str):
-    return [
-        {"command": "uvx", "args": ["mcp-server-fetch"]},
-        {
-            "command": "npx",
-            "args": ["-y", "@modelcontextprotocol/server-brave-search"],
-            "env": brave_env,
-        },
-        {
-            "command": "npx",
-            "args": ["-y", "mcp-memory-libsql"],
-            "env": {"LIBSQL_URL": f"file:./memory/{name}.db"},
-        },
-    ]
+    return researcher_shared_mcp_server_params + [researcher_memory_mcp_server_params(name)]
@@ -0,0 +1,149 @@
+from agents.mcp import MCPServerStdio
+from mcp_params import (
+    trader_mcp_server_params,
+    researcher_shared_mcp_server_params,
+    researcher_memory_mcp_server_params,
+)
+from research_cache import CachedMCPServerStdio, research_cache
+from dataclasses import dataclass
+import asyncio
+
+CLIENT_SESSION_TIMEOUT_SECONDS = 120
+HEALTH_CHECK_TIMEOUT_SECONDS = 10
+
+
+@dataclass
+class PooledServer:
+    params: dict
+    server: MCPServerStdio
+    task: asyncio.Task
+    stop: asyncio.Event
+    cached: bool = False
+
+
+class MCPServerPool:
+    """
+    The MCP servers for the whole trading floor, started once and reused on every cycle.
+
+    The accounts, push, market, fetch and search servers are stateless (tools take the account name
+    as an argument), so a single copy of each is shared by all the traders; calls to the fetch and
+    search servers also go through the shared research cache. Each trader keeps its own
+    memory server, as that holds the trader's knowledge graph. Without research (as in a backtest,
+    where today's web would leak the future) only the trader servers are started.
+
+    Each server is connected and cleaned up by its own background task, as the MCP stdio transport
+    must be entered and exited in the same task; that lets any one server be restarted on its own.
+    """
+
+    def __init__(self, names: list[str], trader_params: list[dict] = trader_mcp_server_params, research: bool = True):
+        self.names = names
+        self.trader_params = trader_params
+        self.research = research
+        self.trader_servers: list[PooledServer] = []
+        self.researcher_shared_servers: list[PooledServer] = []
+        self.memory_servers: dict[str, PooledServer] = {}
+
+    @staticmethod
+    async def hold(server: MCPServerStdio, ready: asyncio.Future, stop: asyncio.Event) -> None:
+        try:
+            await server.connect()
+            ready.set_result(server)
+            await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            await server.cleanup()
+
+    async def start_server(self, params: dict, cached: bool = False) -> PooledServer:
+        options = dict(cache_tools_list=True, client_session_timeout_seconds=CLIENT_SESSION_TIMEOUT_SECONDS)
+        if cached:
+            server = CachedMCPServerStdio(params, research_cache, **options)
+        else:
+            server = MCPServerStdio(params, **options)
+        ready = asyncio.get_running_loop().create_future()
+        stop = asyncio.Event()
+        task = asyncio.create_task(self.hold(server, ready, stop))
+        await ready
+        return PooledServer(params, server, task, stop, cached)
+
+    @staticmethod
+    async def stop_server(pooled: PooledServer) -> None:
+        pooled.stop.set()
+        try:
+            await pooled.task
+        except Exception as e:
+            print(f"Error stopping MCP server {pooled.server.name}: {e}")
+
+    async def start_servers(self, params_list: list[dict], cached: bool = False) -> list[PooledServer]:
+        """Start the servers together; if any of them fails, stop the others and raise its error"""
+        results = await asyncio.gather(
+            *[self.start_server(params, cached) for params in params_list], return_exceptions=True
+        )
+        started = [result for result in results if isinstance(result, PooledServer)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await asyncio.gather(*[self.stop_server(pooled) for pooled in started])
+            raise errors[0]
+        return started
+
+    async def start(self) -> None:
+        """Start every server, or none: if one fails to start, those already running are stopped"""
+        try:
+            self.trader_servers = await self.start_servers(self.trader_params)
+            if not self.research:
+                return
+            self.researcher_shared_servers = await self.start_servers(researcher_shared_mcp_server_params, cached=True)
+            memory_servers = await self.start_servers(
+                [researcher_memory_mcp_server_params(name) for name in self.names]
+            )
+            self.memory_servers = dict(zip(self.names, memory_servers))
+        except Exception:
+            await self.close()
+            raise
+
+    def get_trader_servers(self) -> list[MCPServerStdio]:
+        return [pooled.server for pooled in self.trader_servers]
+
+    def get_researcher_servers(self, name: str) -> list[MCPServerStdio]:
+        if not self.research:
+            return []
+        pooled_servers = self.researcher_shared_servers + [self.memory_servers[name]]
+        return [pooled.server for pooled in pooled_servers]
+
+    @staticmethod
+    async def is_healthy(pooled: PooledServer) -> bool:
+        if pooled.task.done() or pooled.server.session is None:
+            return False
+        try:
+            await asyncio.wait_for(pooled.server.session.send_ping(), HEALTH_CHECK_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    async def restart_if_unhealthy(self, pooled: PooledServer) -> PooledServer:
+        if await self.is_healthy(pooled):
+            return pooled
+        print(f"Restarting MCP server {pooled.server.name}")
+        await self.stop_server(pooled)
+        return await self.start_server(pooled.params, pooled.cached)
+
+    async def health_check(self) -> None:
+        """Ping every server, restarting any that have died or stopped responding; run between cycles"""
+        self.trader_servers = await asyncio.gather(
+            *[self.restart_if_unhealthy(pooled) for pooled in self.trader_servers]
+        )
+        self.researcher_shared_servers = await asyncio.gather(
+            *[self.restart_if_unhealthy(pooled) for pooled in self.researcher_shared_servers]
+        )
+        memory_servers = await asyncio.gather(
+            *[self.restart_if_unhealthy(pooled) for pooled in self.memory_servers.values()]
+        )
+        self.memory_servers = dict(zip(self.memory_servers, memory_servers))
+
+    async def close(self) -> None:
+        pooled_servers = self.trader_servers + self.researcher_shared_servers + list(self.memory_servers.values())
+        await asyncio.gather(*[self.stop_server(pooled) for pooled in pooled_servers])
+        self.trader_servers = []
+        self.researcher_shared_servers = []
+        self.memory_servers = {}
@@ -0,0 +1,299 @@
+"""
+A local stand-in for an OpenAI-compatible model server, for load testing the agent frameworks
+without spending money or needing the network.
+
+It serves /v1/chat/completions (streaming and not, with tool calls) and /v1/models, answering from:
+1. Recorded transcripts (MOCK_LLM_TRANSCRIPTS, JSON lines), matched on the model, messages and tools.
+   With MOCK_LLM_UPSTREAM set, requests with no recording are sent to that real server and recorded.
+2. A script (MOCK_LLM_SCRIPT, JSON): a list of rules, each with an optional "match" substring looked
+   for in the system message, and "steps" answered in order, one per assistant turn, e.g.
+   [{"match": "Warren", "steps": [
+       {"tool_calls": [{"name": "get_balance", "arguments": {"name": "Warren"}}]},
+       {"content": "All done", "completion_tokens": 200}
+   ]}]
+3. Otherwise a short fixed reply.
+
+Each reply waits MOCK_LLM_LATENCY_MS (plus up to MOCK_LLM_JITTER_MS, seeded for repeatability)
+and MOCK_LLM_MS_PER_TOKEN per completion token. Usage is estimated from the text unless a step sets
+prompt_tokens or completion_tokens. Like a provider's prompt cache, it reports as cached the tokens in
+the longest run of leading messages it has already seen with the same tools.
+
+It doesn't serve the Responses API (/v1/responses), which the agents SDK uses by default.
+
+Run with: uv run mock_llm.py
+Then set MOCK_LLM_URL=http://localhost:8765/v1 for the trading floor, which then sends every agent's
+requests to the mock through Chat Completions. Anything else built on the OpenAI client's Chat
+Completions API (LangChain, AutoGen, CrewAI) can use it by setting OPENAI_BASE_URL to the same; other
+code using the agents SDK also needs set_default_openai_api("chat_completions").
+"""
+
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+import asyncio
+import hashlib
+import httpx
+import json
+import os
+import random
+import time
+import uvicorn
+
+load_dotenv(override=True)
+
+MOCK_LLM_PORT = int(os.getenv("MOCK_LLM_PORT", "8765"))
+CHARS_PER_TOKEN = 4
+DEFAULT_REPLY = "OK"
+PROMPT_CACHE_ENTRIES = 100_000
+
+
+@dataclass
+class MockSettings:
+    latency_ms: float = float(os.getenv("MOCK_LLM_LATENCY_MS", "0"))
+    jitter_ms: float = float(os.getenv("MOCK_LLM_JITTER_MS", "0"))
+    ms_per_token: float = float(os.getenv("MOCK_LLM_MS_PER_TOKEN", "0"))
+    script: str | None = os.getenv("MOCK_LLM_SCRIPT")
+    transcripts: str | None = os.getenv("MOCK_LLM_TRANSCRIPTS")
+    upstream: str | None = os.getenv("MOCK_LLM_UPSTREAM")
+    upstream_key: str | None = os.getenv("MOCK_LLM_UPSTREAM_KEY", os.getenv("OPENAI_API_KEY"))
+    seed: int = int(os.getenv("MOCK_LLM_SEED", "0"))
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    streamed: int = 0
+    sources: dict[str, int] = field(default_factory=dict)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    delay_seconds: float = 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def transcript_key(body: dict) -> str:
+    """Identify a request by what determines its answer, ignoring sampling settings and ids"""
+    tools = sorted(tool.get("function", {}).get("name", "") for tool in body.get("tools") or [])
+    messages = [
+        {
+            "role": m.get("role"),
+            "content": m.get("content"),
+            "tool_calls": [call.get("function") for call in m.get("tool_calls") or []],
+        }
+        for m in body.get("messages", [])
+    ]
+    key = json.dumps({"model": body.get("model"), "messages": messages, "tools": tools}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class MockLLM:
+    def __init__(self, settings: MockSettings | None = None, rules: list[dict] | None = None):
+        self.settings = settings or MockSettings()
+        self.stats = MockStats()
+        self.rng = random.Random(self.settings.seed)
+        self.rules = rules if rules is not None else self.load_script()
+        self.recordings = self.load_transcripts()
+        self.prefixes: set[str] = set()
+        self.lock = asyncio.Lock()
+
+    def load_script(self) -> list[dict]:
+        if not self.settings.script:
+            return []
+        with open(self.settings.script) as f:
+            return json.load(f)
+
+    def load_transcripts(self) -> dict[str, dict]:
+        path = self.settings.transcripts
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        return {entry["key"]: entry["response"] for entry in entries}
+
+    def pick_step(self, body: dict) -> dict | None:
+        messages = body.get("messages", [])
+        system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") in ("system", "developer"))
+        turn = sum(1 for m in messages if m.get("role") == "assistant")
+        for rule in self.rules:
+            if rule.get("match", "") in system and rule.get("steps"):
+                steps = rule["steps"]
+                return steps[min(turn, len(steps) - 1)]
+        return None
+
+    def cached_tokens(self, body: dict) -> int:
+        """The tokens in the leading messages already seen in an earlier request with the same tools"""
+        if len(self.prefixes) > PROMPT_CACHE_ENTRIES:
+            self.prefixes.clear()
+        digest = hashlib.sha256(json.dumps(body.get("tools") or [], sort_keys=True).encode())
+        cached = chars = 0
+        for message in body.get("messages", []):
+            text = json.dumps(message, sort_keys=True)
+            digest.update(text.encode())
+            chars += len(text)
+            prefix = digest.hexdigest()
+            if prefix in self.prefixes:
+                cached = chars // CHARS_PER_TOKEN
+            else:
+                self.prefixes.add(prefix)
+        return cached
+
+    def scripted(self, body: dict, step: dict | None) -> dict:
+        step = step or {"content": DEFAULT_REPLY}
+        offered = {tool.get("function", {}).get("name") for tool in body.get("tools") or []}
+        tool_calls = [
+            {
+                "id": f"call_{self.rng.getrandbits(48):012x}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+            }
+            for call in step.get("tool_calls", [])
+            if call["name"] in offered
+        ]
+        content = step.get("content")
+        if not tool_calls and content is None:
+            content = DEFAULT_REPLY
+        prompt_tokens = step.get("prompt_tokens", estimate_tokens(json.dumps(body.get("messages", []))))
+        completion_tokens = step.get("completion_tokens", estimate_tokens((content or "") + json.dumps(tool_calls)))
+        return {
+            "id": f"chatcmpl-mock-{self.rng.getrandbits(48):012x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content, "tool_calls": tool_calls or None},
+                    "finish_reason": "tool_calls" if tool_calls else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": min(prompt_tokens, self.cached_tokens(body))},
+            },
+        }
+
+    async def record(self, body: dict, key: str) -> dict:
+        headers = {"Authorization": f"Bearer {self.settings.upstream_key}"}
+        body = {key: value for key, value in body.items() if key != "stream_options"}
+        async with httpx.AsyncClient(timeout=120) as client:
+            response = await client.post(
+                f"{self.settings.upstream.rstrip('/')}/chat/completions",
+                json={**body, "stream": False},
+                headers=headers,
+            )
+            response.raise_for_status()
+        completion = response.json()
+        async with self.lock:
+            self.recordings[key] = completion
+            with open(self.settings.transcripts, "a") as f:
+                f.write(json.dumps({"key": key, "request": body, "response": completion}) + "\n")
+        return completion
+
+    async def complete(self, body: dict) -> tuple[dict, float]:
+        """Answer a request, returning the completion and the seconds it should appear to take"""
+        key = transcript_key(body)
+        step = None
+        if key in self.recordings:
+            source, completion = "recorded", self.recordings[key]
+        elif self.settings.upstream and self.settings.transcripts:
+            source, completion = "upstream", await self.record(body, key)
+        else:
+            step = self.pick_step(body)
+            source = "scripted" if step else "default"
+            completion = self.scripted(body, step)
+        usage = completion.get("usage") or {}
+        completion_tokens = usage.get("completion_tokens", 0)
+        latency_ms = (step or {}).get("latency_ms", self.settings.latency_ms)
+        delay = (
+            latency_ms
+            + self.rng.random() * self.settings.jitter_ms
+            + completion_tokens * self.settings.ms_per_token
+        ) / 1000
+        stats = self.stats
+        stats.requests += 1
+        stats.sources[source] = stats.sources.get(source, 0) + 1
+        stats.prompt_tokens += usage.get("prompt_tokens", 0)
+        stats.completion_tokens += completion_tokens
+        stats.cached_tokens += (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        stats.delay_seconds += delay
+        return completion, delay
+
+    @staticmethod
+    def chunks(completion: dict, include_usage: bool):
+        """Split a completion into the chunks a streaming server would send"""
+        choice = completion["choices"][0]
+        message = choice["message"]
+        base = {key: completion[key] for key in ("id", "created", "model")}
+        base["object"] = "chat.completion.chunk"
+
+        def chunk(delta: dict, finish_reason=None) -> dict:
+            return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        yield chunk({"role": "assistant", "content": ""})
+        for word in (message.get("content") or "").split(" "):
+            if word:
+                yield chunk({"content": word + " "})
+        for index, call in enumerate(message.get("tool_calls") or []):
+            yield chunk({"tool_calls": [{"index": index, **call}]})
+        yield chunk({}, choice.get("finish_reason", "stop"))
+        if include_usage:
+            yield {**base, "choices": [], "usage": completion.get("usage")}
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        completion, delay = await self.complete(body)
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return JSONResponse(completion)
+        self.stats.streamed += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        chunks = list(self.chunks(completion, include_usage))
+
+        async def events():
+            for chunk in chunks:
+                await asyncio.sleep(delay / len(chunks))
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def models(self, request: Request):
+        return JSONResponse({"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+
+    async def get_stats(self, request: Request):
+        stats = self.stats
+        return JSONResponse(
+            {
+                "requests": stats.requests,
+                "streamed": stats.streamed,
+                "sources": stats.sources,
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "cached_tokens": stats.cached_tokens,
+                "mean_delay_ms": 1000 * stats.delay_seconds / stats.requests if stats.requests else 0.0,
+            }
+        )
+
+    def create_app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/v1/chat/completions", self.chat_completions, methods=["POST"]),
+                Route("/v1/models", self.models),
+                Route("/stats", self.get_stats),
+            ]
+        )
+
+
+if __name__ == "__main__":
+    mock = MockLLM()
+    print(f"Mock LLM serving http://localhost:{MOCK_LLM_PORT}/v1 with {len(mock.rules)} script rules "
+          f"and {len(mock.recordings)} recorded responses")
+    uvicorn.run(mock.create_app(), host="127.0.0.1", port=MOCK_LLM_PORT, log_level="warning")
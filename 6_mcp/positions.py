@@ -0,0 +1,116 @@
+from collections import deque
+from enum import Enum
+
+
+class CostBasisMethod(str, Enum):
+    FIFO = "fifo"
+    AVERAGE = "average"
+
+
+class Position:
+    """
+    A running position in one symbol: the quantity held, its cost basis and the profit or loss
+    realized by sales so far. Each buy or sell updates it in constant time (amortized, for FIFO).
+    """
+
+    def __init__(self, symbol: str, method: CostBasisMethod = CostBasisMethod.FIFO):
+        self.symbol = symbol
+        self.method = method
+        self.quantity = 0
+        self.cost_basis = 0.0
+        self.realized_profit_loss = 0.0
+        self.lots = deque()
+
+    def buy(self, quantity: int, price: float) -> None:
+        self.quantity += quantity
+        self.cost_basis += quantity * price
+        if self.method == CostBasisMethod.FIFO:
+            self.lots.append([quantity, price])
+
+    def sell(self, quantity: int, price: float) -> None:
+        if quantity > self.quantity:
+            raise ValueError(f"Cannot sell {quantity} shares of {self.symbol}; only {self.quantity} held.")
+        if self.method == CostBasisMethod.FIFO:
+            cost = 0.0
+            remaining = quantity
+            while remaining:
+                lot = self.lots[0]
+                used = min(remaining, lot[0])
+                cost += used * lot[1]
+                lot[0] -= used
+                remaining -= used
+                if lot[0] == 0:
+                    self.lots.popleft()
+        else:
+            cost = self.average_cost * quantity
+        self.quantity -= quantity
+        self.cost_basis = self.cost_basis - cost if self.quantity else 0.0
+        self.realized_profit_loss += quantity * price - cost
+
+    @property
+    def average_cost(self) -> float:
+        return self.cost_basis / self.quantity if self.quantity else 0.0
+
+    def market_value(self, price: float) -> float:
+        return self.quantity * price
+
+    def unrealized_profit_loss(self, price: float) -> float:
+        return self.market_value(price) - self.cost_basis
+
+
+class Ledger:
+    """
+    Position accounting for an account, built once from its transactions and then kept up to date
+    one trade at a time, so that reports never need to rescan the transaction history.
+    """
+
+    def __init__(self, method: CostBasisMethod = CostBasisMethod.FIFO):
+        self.method = CostBasisMethod(method)
+        self.positions: dict[str, Position] = {}
+        self.net_invested = 0.0
+
+    @classmethod
+    def from_transactions(cls, transactions, method: CostBasisMethod = CostBasisMethod.FIFO) -> "Ledger":
+        ledger = cls(method)
+        for transaction in transactions:
+            ledger.apply(transaction.symbol, transaction.quantity, transaction.price)
+        return ledger
+
+    def apply(self, symbol: str, quantity: int, price: float) -> None:
+        """Record a trade; quantity is positive for a buy and negative for a sale"""
+        position = self.positions.get(symbol)
+        if position is None:
+            position = self.positions[symbol] = Position(symbol, self.method)
+        if quantity > 0:
+            position.buy(quantity, price)
+        else:
+            position.sell(-quantity, price)
+        self.net_invested += quantity * price
+
+    def holdings_value(self, prices: dict[str, float]) -> float:
+        return sum(p.market_value(prices.get(s, 0.0)) for s, p in self.positions.items() if p.quantity)
+
+    def realized_profit_loss(self) -> float:
+        return sum(p.realized_profit_loss for p in self.positions.values())
+
+    def unrealized_profit_loss(self, prices: dict[str, float]) -> float:
+        return sum(p.unrealized_profit_loss(prices.get(s, 0.0)) for s, p in self.positions.items() if p.quantity)
+
+    def profit_loss(self, holdings_value: float) -> float:
+        """Total profit or loss from trading: realized plus unrealized, whichever cost basis method is used"""
+        return holdings_value - self.net_invested
+
+    def summary(self, prices: dict[str, float]) -> dict[str, dict]:
+        """Per symbol quantity, cost basis and profit or loss for the positions currently held"""
+        return {
+            symbol: {
+                "quantity": position.quantity,
+                "average_cost": round(position.average_cost, 2),
+                "cost_basis": round(position.cost_basis, 2),
+                "market_value": round(position.market_value(prices.get(symbol, 0.0)), 2),
+                "unrealized_profit_loss": round(position.unrealized_profit_loss(prices.get(symbol, 0.0)), 2),
+                "realized_profit_loss": round(position.realized_profit_loss, 2),
+            }
+            for symbol, position in self.positions.items()
+            if position.quantity
+        }
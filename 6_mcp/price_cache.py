@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+import time
+from database import read_prices, write_prices
+
+# How long a price stays fresh, by the kind of market data the Polygon plan provides
+TIER_TTL_SECONDS = {
+    "realtime": 15,
+    "delayed": 60,
+    "eod": 60 * 60,
+}
+
+LRU_SIZE = 2048
+
+
+@dataclass
+class CachedPrice:
+    price: float
+    fetched: float
+    market_closed: bool
+
+
+class PriceCache:
+    """
+    A two level cache of share prices: an in-process LRU in front of the market_prices table,
+    which is shared by every process using accounts.db, in front of the upstream lookup.
+
+    A price is fresh for its tier's TTL. A price fetched while the market was closed stays fresh
+    for as long as the market remains closed, so nothing is re-queried overnight or at weekends.
+    A symbol that another thread is already fetching is waited for rather than fetched again, so
+    concurrent lookups that miss together make one upstream call between them.
+    """
+
+    def __init__(self, tier: str, fetch, is_market_open, lru_size: int = LRU_SIZE):
+        self.tier = tier
+        self.ttl = TIER_TTL_SECONDS[tier]
+        self.fetch = fetch
+        self.is_market_open = is_market_open
+        self.lru_size = lru_size
+        self.entries: OrderedDict[str, CachedPrice] = OrderedDict()
+        self.lock = threading.Lock()
+        # The symbols being fetched right now, each with an event set when its fetch is over
+        self.pending: dict[str, threading.Event] = {}
+        self.stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "coalesced": 0,
+            "misses": 0,
+            "upstream_calls": 0,
+            "upstream_seconds": 0.0,
+        }
+
+    def is_market_closed(self) -> bool:
+        try:
+            return not self.is_market_open()
+        except Exception as e:
+            print(f"Unable to check whether the market is open due to {e}; assuming it is")
+            return False
+
+    def is_fresh(self, entry: CachedPrice, now: float, market_closed: bool) -> bool:
+        if now - entry.fetched < self.ttl:
+            return True
+        return entry.market_closed and market_closed
+
+    def remember(self, symbol: str, entry: CachedPrice) -> None:
+        self.entries[symbol] = entry
+        self.entries.move_to_end(symbol)
+        while len(self.entries) > self.lru_size:
+            self.entries.popitem(last=False)
+
+    def get_many(self, symbols: list[str]) -> dict[str, float]:
+        now = time.time()
+        # Checked before taking the lock, as it may call the market status API
+        market_closed = self.is_market_closed()
+        prices = {}
+        missing = []
+        with self.lock:
+            for symbol in symbols:
+                entry = self.entries.get(symbol)
+                if entry and self.is_fresh(entry, now, market_closed):
+                    self.entries.move_to_end(symbol)
+                    prices[symbol] = entry.price
+                    self.stats["memory_hits"] += 1
+                else:
+                    missing.append(symbol)
+
+        if missing:
+            stored = read_prices(self.tier, missing)
+            with self.lock:
+                for symbol, (price, fetched, market_closed) in stored.items():
+                    entry = CachedPrice(price, fetched, market_closed)
+                    if self.is_fresh(entry, now, market_closed):
+                        self.remember(symbol, entry)
+                        prices[symbol] = price
+                        self.stats["db_hits"] += 1
+            missing = [symbol for symbol in missing if symbol not in prices]
+
+        if missing:
+            prices.update(self.fetch_once(missing, now))
+        return prices
+
+    def fetch_once(self, symbols: list[str], now: float) -> dict[str, float]:
+        """Fetch the symbols no other thread is fetching, then wait for those that one is"""
+        with self.lock:
+            waiting = {symbol: self.pending[symbol] for symbol in symbols if symbol in self.pending}
+            fetching = [symbol for symbol in symbols if symbol not in waiting]
+            done = threading.Event()
+            for symbol in fetching:
+                self.pending[symbol] = done
+        prices = {}
+        try:
+            if fetching:
+                prices.update(self.refresh(fetching))
+        finally:
+            with self.lock:
+                for symbol in fetching:
+                    self.pending.pop(symbol, None)
+            done.set()
+        for event in set(waiting.values()):
+            event.wait()
+        with self.lock:
+            for symbol in waiting:
+                entry = self.entries.get(symbol)
+                if entry and entry.fetched >= now:
+                    prices[symbol] = entry.price
+                    self.stats["coalesced"] += 1
+        # If the other fetch failed, try these symbols again here
+        failed = [symbol for symbol in waiting if symbol not in prices]
+        if failed:
+            prices.update(self.refresh(failed))
+        return prices
+
+    def refresh(self, symbols: list[str]) -> dict[str, float]:
+        start = time.perf_counter()
+        fetched = self.fetch(symbols)
+        elapsed = time.perf_counter() - start
+        now = time.time()
+        market_closed = self.is_market_closed()
+        write_prices(self.tier, [(symbol, price, now, market_closed) for symbol, price in fetched.items()])
+        with self.lock:
+            self.stats["misses"] += len(symbols)
+            self.stats["upstream_calls"] += 1
+            self.stats["upstream_seconds"] += elapsed
+            for symbol, price in fetched.items():
+                self.remember(symbol, CachedPrice(price, now, market_closed))
+        return fetched
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+        served = stats["memory_hits"] + stats["db_hits"] + stats["coalesced"]
+        lookups = served + stats["misses"]
+        stats["hit_rate"] = served / lookups if lookups else 0.0
+        calls = stats["upstream_calls"]
+        stats["upstream_latency_ms"] = 1000 * stats["upstream_seconds"] / calls if calls else 0.0
+        return stats
@@ -0,0 +1,173 @@
+from agents.mcp import MCPServerStdio
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from mcp.types import CallToolResult
+from urllib.parse import urlsplit
+import asyncio
+import gzip
+import hashlib
+import httpx
+import json
+import os
+import time
+
+load_dotenv(override=True)
+
+RESEARCH_CACHE_DIR = os.getenv("RESEARCH_CACHE_DIR", "research_cache")
+FETCH_CACHE_TTL_SECONDS = int(os.getenv("FETCH_CACHE_TTL_SECONDS", "3600"))
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "1800"))
+REVALIDATE_TIMEOUT_SECONDS = 10
+
+# The research tools worth caching, and how long a result stays fresh before it must be revalidated
+CACHED_TOOLS = {
+    "fetch": FETCH_CACHE_TTL_SECONDS,
+    "brave_web_search": SEARCH_CACHE_TTL_SECONDS,
+    "brave_local_search": SEARCH_CACHE_TTL_SECONDS,
+}
+
+
+@dataclass
+class ResearchCacheStats:
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    uncached: int = 0
+
+
+class ResearchCache:
+    """
+    A cache of research tool results in front of the fetch and search MCP servers, shared by every
+    trader: each result is stored gzipped on disk under the hash of the tool and its arguments
+    (the URL or the query), so it is also shared between processes and survives restarts.
+
+    A result is served as is within its tool's TTL. After that, a fetched page is revalidated with
+    a conditional request using the ETag or Last-Modified it was stored with, and is only fetched
+    again through the MCP server if it has changed. The validators are only looked up, with a HEAD
+    request, when a page is fetched again after going stale, and never again for a host that sends
+    neither header. Identical calls in flight at the same time, say from two traders researching
+    the same story, share a single upstream call. The cache files are read and written in a thread.
+    """
+
+    def __init__(self, directory: str = RESEARCH_CACHE_DIR, ttls: dict[str, int] = CACHED_TOOLS):
+        self.directory = directory
+        self.ttls = ttls
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self.hosts_without_validators: set[str] = set()
+        self.stats = ResearchCacheStats()
+
+    @staticmethod
+    def key(tool_name: str, arguments: dict) -> str:
+        return hashlib.sha256(json.dumps([tool_name, arguments], sort_keys=True).encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def read(self, key: str) -> dict | None:
+        try:
+            with gzip.open(self.path(key), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key: str, entry: dict) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(f"{path}.tmp", "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(f"{path}.tmp", path)
+
+    async def get_validators(self, url: str) -> dict:
+        host = urlsplit(url).hostname
+        if host in self.hosts_without_validators:
+            return {}
+        try:
+            async with httpx.AsyncClient(timeout=REVALIDATE_TIMEOUT_SECONDS, follow_redirects=True) as client:
+                response = await client.head(url)
+        except httpx.HTTPError:
+            return {}
+        validators = {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+        if not any(validators.values()):
+            self.hosts_without_validators.add(host)
+        return validators
+
+    @staticmethod
+    async def is_unchanged(url: str, entry: dict) -> bool:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        if not headers:
+            return False
+        try:
+            async with httpx.AsyncClient(timeout=REVALIDATE_TIMEOUT_SECONDS, follow_redirects=True) as client:
+                response = await client.head(url, headers=headers)
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 304
+
+    async def fill(self, key: str, tool_name: str, arguments: dict, call, stale: bool) -> CallToolResult:
+        """Call upstream and store the result, with the page's validators if it was cached before"""
+        url = arguments.get("url") if tool_name == "fetch" else None
+        if url and stale:
+            result, validators = await asyncio.gather(call(), self.get_validators(url))
+        else:
+            result, validators = await call(), {}
+        if not result.isError:
+            entry = {"stored": time.time(), "result": result.model_dump(mode="json"), **validators}
+            await asyncio.to_thread(self.write, key, entry)
+        return result
+
+    async def call(self, tool_name: str, arguments: dict | None, call) -> CallToolResult:
+        """The result of calling tool_name with arguments, from the cache if possible, else from call()"""
+        arguments = arguments or {}
+        ttl = self.ttls.get(tool_name)
+        if ttl is None:
+            self.stats.uncached += 1
+            return await call()
+        key = self.key(tool_name, arguments)
+        entry = await asyncio.to_thread(self.read, key)
+        if entry:
+            if time.time() - entry["stored"] < ttl:
+                self.stats.hits += 1
+                return CallToolResult.model_validate(entry["result"])
+            if tool_name == "fetch" and await self.is_unchanged(arguments.get("url", ""), entry):
+                self.stats.revalidated += 1
+                await asyncio.to_thread(self.write, key, {**entry, "stored": time.time()})
+                return CallToolResult.model_validate(entry["result"])
+        if key in self.in_flight:
+            self.stats.coalesced += 1
+            return await asyncio.shield(self.in_flight[key])
+        self.stats.misses += 1
+        future = asyncio.ensure_future(self.fill(key, tool_name, arguments, call, stale=entry is not None))
+        self.in_flight[key] = future
+        future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def get_stats(self) -> dict:
+        stats = self.stats
+        served = stats.hits + stats.revalidated + stats.coalesced
+        lookups = served + stats.misses
+        return {
+            "hits": stats.hits,
+            "revalidated": stats.revalidated,
+            "coalesced": stats.coalesced,
+            "misses": stats.misses,
+            "hit_rate": served / lookups if lookups else 0.0,
+        }
+
+
+class CachedMCPServerStdio(MCPServerStdio):
+    """An MCP server whose tool calls go through a ResearchCache"""
+
+    def __init__(self, params, cache: ResearchCache, **kwargs):
+        super().__init__(params, **kwargs)
+        self.cache = cache
+
+    async def call_tool(self, tool_name: str, arguments: dict | None) -> CallToolResult:
+        upstream = super().call_tool
+        return await self.cache.call(tool_name, arguments, lambda: upstream(tool_name, arguments))
+
+
+research_cache = ResearchCache()
@@ -0,0 +1,134 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from market import is_market_open
+from database import write_run
+from mcp_pool import MCPServerPool
+from traders import Trader
+import asyncio
+
+
+@dataclass
+class Schedule:
+    every_seconds: float
+    timeout_seconds: float
+    offset_seconds: float = 0.0
+
+
+class TradingScheduler:
+    """
+    Runs each trader on its own cadence instead of all of them in lockstep.
+
+    Every trader has its own loop, so a slow trader only delays itself. Start times are staggered
+    by each schedule's offset to spread the load on the model and data APIs. A run that is still
+    going when its next slot comes round causes that slot to be skipped rather than queued, and
+    a run that exceeds its timeout is cancelled. Each run is recorded in the runs table with its
+    duration and queue lag (how late it started against its slot).
+
+    The MCP servers are only health checked while no trader is running, since restarting one
+    would break a run that is using it: once a check is due, runs that come due wait until the
+    ones in progress have finished and the check is done.
+    """
+
+    def __init__(
+        self,
+        traders: list[Trader],
+        schedules: list[Schedule],
+        mcp_pool: MCPServerPool,
+        health_check_seconds: float,
+        run_when_market_closed: bool = False,
+    ):
+        self.jobs = list(zip(traders, schedules))
+        self.mcp_pool = mcp_pool
+        self.health_check_seconds = health_check_seconds
+        self.run_when_market_closed = run_when_market_closed
+        self.market_open = False
+        self.running = 0
+        self.checking = False
+        self.idle = asyncio.Condition()
+
+    async def should_run(self) -> bool:
+        if self.run_when_market_closed:
+            return True
+        try:
+            # The market status may be fetched over the network, so it is checked off the event loop
+            self.market_open = await asyncio.to_thread(is_market_open)
+        except Exception as e:
+            print(f"Unable to check whether the market is open due to {e}; using last known state")
+        return self.market_open
+
+    @staticmethod
+    async def record(trader: Trader, scheduled: float, lag: float, duration: float, status: str) -> None:
+        scheduled_at = datetime.fromtimestamp(scheduled, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            await asyncio.to_thread(write_run, trader.name, scheduled_at, lag, duration, status)
+        except Exception as e:
+            print(f"Unable to record run for {trader.name}: {e}")
+
+    @asynccontextmanager
+    async def using_servers(self):
+        async with self.idle:
+            await self.idle.wait_for(lambda: not self.checking)
+            self.running += 1
+        try:
+            yield
+        finally:
+            async with self.idle:
+                self.running -= 1
+                self.idle.notify_all()
+
+    @asynccontextmanager
+    async def servers_idle(self):
+        try:
+            async with self.idle:
+                # Hold back new runs from now on, or overlapping runs could keep the check waiting forever
+                self.checking = True
+                await self.idle.wait_for(lambda: self.running == 0)
+            yield
+        finally:
+            async with self.idle:
+                self.checking = False
+                self.idle.notify_all()
+
+    async def run_trader(self, trader: Trader, schedule: Schedule) -> None:
+        loop = asyncio.get_running_loop()
+        wall_offset = datetime.now().timestamp() - loop.time()
+        next_run = loop.time() + schedule.offset_seconds
+        while True:
+            await asyncio.sleep(max(0.0, next_run - loop.time()))
+            scheduled = next_run
+            next_run += schedule.every_seconds
+            if not await self.should_run():
+                print(f"Market is closed, skipping run for {trader.name}")
+                await self.record(trader, scheduled + wall_offset, loop.time() - scheduled, 0.0, "market closed")
+                continue
+            status = "completed"
+            async with self.using_servers():
+                started = loop.time()
+                lag = started - scheduled
+                try:
+                    await asyncio.wait_for(trader.run(self.mcp_pool), schedule.timeout_seconds)
+                except asyncio.TimeoutError:
+                    print(f"Run for {trader.name} timed out after {schedule.timeout_seconds:.0f} seconds")
+                    status = "timed out"
+                duration = loop.time() - started
+            await self.record(trader, scheduled + wall_offset, lag, duration, status)
+            while next_run <= loop.time():
+                await self.record(trader, next_run + wall_offset, loop.time() - next_run, 0.0, "skipped")
+                next_run += schedule.every_seconds
+
+    async def check_servers(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_seconds)
+            async with self.servers_idle():
+                await self.mcp_pool.health_check()
+
+    async def run(self) -> None:
+        tasks = [asyncio.create_task(self.run_trader(trader, schedule)) for trader, schedule in self.jobs]
+        tasks.append(asyncio.create_task(self.check_servers()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,148 @@
+"""
+The simulated clock and historical prices used when the trading floor is backtested.
+
+With BACKTEST=true every process (the trading floor and the MCP servers it launches) works against
+BACKTEST_DB instead of accounts.db, takes the time from the clock stored there, and prices shares
+from the historical store: BACKTEST_PRICES_FILE (a .csv of date,symbol,close or a saved .npz) if set,
+else the daily rows in the market table of accounts.db.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from dotenv import load_dotenv
+import csv
+import json
+import os
+import sqlite3
+import numpy as np
+import database
+from database import read_clock, write_clock, READ_MARKET_RANGE_SQL
+
+load_dotenv(override=True)
+
+BACKTEST = os.getenv("BACKTEST", "false").strip().lower() == "true"
+BACKTEST_DB = os.getenv("BACKTEST_DB", "backtest.db")
+BACKTEST_PRICES_FILE = os.getenv("BACKTEST_PRICES_FILE")
+LIVE_DB = "accounts.db"
+
+MARKET_CLOSE = "16:00:00"
+
+if BACKTEST:
+    # A backtest keeps its accounts, logs and clock apart from the live trading floor
+    database.DB = BACKTEST_DB
+
+
+def now() -> str:
+    """The current local time as 'YYYY-MM-DD HH:MM:SS', or the simulated time during a backtest"""
+    if BACKTEST:
+        simulated = read_clock()
+        if simulated:
+            return simulated
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def trading_days(start: str, end: str, dates: np.ndarray) -> list[str]:
+    """The dates from start to end that have prices, which makes the price store the trading calendar"""
+    return [day for day in dates.tolist() if start <= day <= end]
+
+
+class SimulatedClock:
+    """
+    Steps through the trading days from start to end, taken from the dates of the historical
+    prices so that the days the market was closed, holidays included, are skipped. Each step is
+    written to the clock table, so the MCP servers, which run in their own processes, see the same
+    simulated time.
+    """
+
+    def __init__(self, start: str, end: str, dates: np.ndarray, time_of_day: str = MARKET_CLOSE):
+        self.start = start
+        self.days = trading_days(start, end, dates)
+        self.time_of_day = time_of_day
+
+    def rewind(self) -> None:
+        """Set the clock to the first day, so that nothing before the first step sees a previous run's time"""
+        write_clock(f"{self.days[0] if self.days else self.start} {self.time_of_day}")
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __iter__(self):
+        for day in self.days:
+            write_clock(f"{day} {self.time_of_day}")
+            yield day
+
+
+class HistoricalPrices:
+    """
+    Daily closes held as a dates x symbols matrix, forward filled across gaps, so the prices
+    for any set of symbols on a date are a single row lookup and one vectorized gather.
+    A symbol with no price yet on a date is priced at 0.0, which accounts treat as unknown.
+    """
+
+    def __init__(self, dates: np.ndarray, symbols: list[str], closes: np.ndarray):
+        self.dates = dates
+        self.symbols = symbols
+        self.columns = {symbol: i for i, symbol in enumerate(symbols)}
+        self.closes = closes
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple[str, dict[str, float]]]) -> "HistoricalPrices":
+        rows = sorted(rows, key=lambda row: row[0])
+        symbols = sorted({symbol for _, data in rows for symbol in data})
+        columns = {symbol: i for i, symbol in enumerate(symbols)}
+        closes = np.full((len(rows), len(symbols)), np.nan)
+        for i, (_, data) in enumerate(rows):
+            closes[i, [columns[symbol] for symbol in data]] = list(data.values())
+        # Carry each symbol's last known close forward over the days it has none
+        known = np.where(np.isnan(closes), 0, np.arange(len(rows))[:, None])
+        closes = closes[np.maximum.accumulate(known, axis=0), np.arange(len(symbols))]
+        dates = np.array([day for day, _ in rows], dtype="U10")
+        return cls(dates, symbols, np.nan_to_num(closes, nan=0.0))
+
+    @classmethod
+    def from_market(cls, start: str, end: str, db: str = LIVE_DB) -> "HistoricalPrices":
+        """
+        Load the daily rows cached in a database's market table. Each row holds the previous
+        session's closes, keyed by the day they were fetched, so a replay never sees ahead.
+        """
+        with sqlite3.connect(f"file:{db}?mode=ro", uri=True) as conn:
+            rows = [(day, json.loads(data)) for day, data in conn.execute(READ_MARKET_RANGE_SQL, (start, end))]
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "HistoricalPrices":
+        by_date: dict[str, dict[str, float]] = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                by_date.setdefault(row["date"][:10], {})[row["symbol"]] = float(row["close"])
+        return cls.from_rows(list(by_date.items()))
+
+    @classmethod
+    def load(cls, path: str) -> "HistoricalPrices":
+        if path.endswith(".csv"):
+            return cls.from_csv(path)
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["dates"], data["symbols"].tolist(), data["closes"])
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, dates=self.dates, symbols=np.array(self.symbols), closes=self.closes)
+
+    def get_prices(self, day: str, symbols: list[str]) -> dict[str, float]:
+        """The closes for the symbols as of day: the latest row on or before it"""
+        row = np.searchsorted(self.dates, day, side="right") - 1
+        if row < 0:
+            return {symbol: 0.0 for symbol in symbols}
+        columns = np.array([self.columns.get(symbol, -1) for symbol in symbols], dtype=int)
+        prices = np.where(columns >= 0, self.closes[row, columns], 0.0)
+        return dict(zip(symbols, prices.tolist()))
+
+
+@lru_cache(maxsize=1)
+def get_historical_prices() -> HistoricalPrices:
+    if BACKTEST_PRICES_FILE:
+        return HistoricalPrices.load(BACKTEST_PRICES_FILE)
+    return HistoricalPrices.from_market("0000-00-00", "9999-99-99")
+
+
+def get_backtest_share_prices(symbols: list[str]) -> dict[str, float]:
+    return get_historical_prices().get_prices(now()[:10], symbols)
@@ -0,0 +1,90 @@
+from agents import Model, ModelResponse, Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+)
+import hashlib
+import json
+import os
+import random
+import time
+
+STUB_SYMBOLS = os.getenv("STUB_SYMBOLS", "AAPL,MSFT,NVDA,AMZN,GOOGL").split(",")
+
+
+class StubModel(Model):
+    """
+    A stand-in for an LLM that answers instantly, for timing the trading engine on its own.
+
+    On its first turn it places one buy or sell of a few shares through the accounts tools,
+    chosen by a generator seeded from the instructions and the message, so the same account on
+    the same simulated day always makes the same trade; on its next turn it finishes.
+    """
+
+    @staticmethod
+    def get_rng(system_instructions: str | None, input) -> random.Random:
+        first = input if isinstance(input, str) else json.dumps(input[0], default=str)
+        seed = hashlib.sha256(f"{system_instructions}\n{first}".encode()).hexdigest()
+        return random.Random(seed)
+
+    @staticmethod
+    def get_name(system_instructions: str | None) -> str:
+        # The trader instructions start "You are <name>, a trader on the stock market."
+        words = (system_instructions or "").split()
+        return words[2].rstrip(",") if len(words) > 2 else ""
+
+    @staticmethod
+    def message(text: str) -> ResponseOutputMessage:
+        return ResponseOutputMessage(
+            id="stub",
+            type="message",
+            role="assistant",
+            status="completed",
+            content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+        )
+
+    def get_output(self, system_instructions, input, tools) -> list:
+        tool_names = {tool.name for tool in tools}
+        answered = not isinstance(input, str) and any(
+            isinstance(item, dict) and item.get("type") == "function_call_output" for item in input
+        )
+        if answered or not {"buy_shares", "sell_shares"} <= tool_names:
+            output = [self.message("Stub model: done for today.")]
+        else:
+            rng = self.get_rng(system_instructions, input)
+            arguments = {
+                "name": self.get_name(system_instructions),
+                "symbol": rng.choice(STUB_SYMBOLS),
+                "quantity": rng.randint(1, 5),
+                "rationale": "Stub model trade",
+            }
+            output = [
+                ResponseFunctionToolCall(
+                    type="function_call",
+                    call_id=f"stub-{rng.getrandbits(32):08x}",
+                    name=rng.choice(["buy_shares", "sell_shares"]),
+                    arguments=json.dumps(arguments),
+                )
+            ]
+        return output
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs):
+        output = self.get_output(system_instructions, input, tools)
+        return ModelResponse(output=output, usage=Usage(), response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs):
+        """Stream the same answer as get_response, all at once as the completed response"""
+        response = Response(
+            id="stub",
+            created_at=time.time(),
+            model="stub",
+            object="response",
+            output=self.get_output(system_instructions, input, tools),
+            tool_choice="auto",
+            tools=[],
+            parallel_tool_calls=False,
+        )
+        yield ResponseCompletedEvent(type="response.completed", response=response, sequence_number=0)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from simulation import now
 from market import is_paid_polygon, is_realtime_polygon
 
 if is_realtime_polygon:
@@ -6,7 +6,7 @@ if is_realtime_polygon:
 elif is_paid_polygon:
     note = "You have access to market data tools but without access to the trade or quote tools; use your get_snapshot_ticker tool to get the latest share price on a 15 min delay. You can also use tools for share information, trends and technical indicators and fundamentals."
 else:
-    note = "You have access to end of day market data; use you get_share_price tool to get the share price as of the prior close."
+    note = "You have access to end of day market data; use you get_share_price tool to get the share price as of the prior close, or lookup_share_prices to price several symbols in one call."
 
 
 def researcher_instructions():
@@ -24,7 +24,7 @@ Also use it to store web addresses that you find interesting so you can check th
 Draw on your knowledge graph to build your expertise over time.
 
 If there isn't a specific request, then just respond with investment opportunities based on searching latest news.
-The current datetime is {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+The current date is {now()[:10]}
 """
 
 def research_tool():
@@ -47,6 +47,16 @@ After you've completed trading, send a push notification with a brief summary of
 Your goal is to maximize your profits according to your strategy.
 """
 
+# Providers cache the longest prompt prefix they have seen recently, so everything that changes between
+# runs goes at the very end: the instructions, tools and strategy before it are the same every run.
+# The researcher's instructions carry only the date, so they stay the same all day.
+def current_state(account):
+    return f"""Here is your current account:
+{account}
+Here is the current datetime:
+{now()}
+"""
+
 def trade_message(name, strategy, account):
     return f"""Based on your investment strategy, you should now look for new opportunities.
 Use the research tool to find news and opportunities consistent with your strategy.
@@ -58,29 +68,23 @@ You do not need to rebalance your portfolio; you will be asked to do so later.
 Just make trades based on your strategy as needed.
 Your investment strategy:
 {strategy}
-Here is your current account:
-{account}
-Here is the current datetime:
-{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-Now, carry out analysis, make your decision and execute trades. Your account name is {name}.
+Carry out analysis, make your decision and execute trades. Your account name is {name}.
 After you've executed your trades, send a push notification with a brief sumnmary of trades and the health of the portfolio, then
 respond with a brief 2-3 sentence appraisal of your portfolio and its outlook.
-"""
+{current_state(account)}"""
 
 def rebalance_message(name, strategy, account):
     return f"""Based on your investment strategy, you should now examine your portfolio and decide if you need to rebalance.
 Use the research tool to find news and opportunities affecting your existing portfolio.
 Use the tools to research stock price and other company information affecting your existing portfolio. {note}
 Finally, make you decision, then execute trades using the tools as needed.
+To make several trades, place them together with the submit_orders tool; they are filled in one step, sells first.
 You do not need to identify new investment opportunities at this time; you will be asked to do so later.
 Just rebalance your portfolio based on your strategy as needed.
 Your investment strategy:
 {strategy}
 You also have a tool to change your strategy if you wish; you can decide at any time that you would like to evolve or even switch your strategy.
-Here is your current account:
-{account}
-Here is the current datetime:
-{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-Now, carry out analysis, make your decision and execute trades. Your account name is {name}.
+Carry out analysis, make your decision and execute trades. Your account name is {name}.
 After you've executed your trades, send a push notification with a brief sumnmary of trades and the health of the portfolio, then
-respond with a brief 2-3 sentence appraisal of your portfolio and its outlook."""
\ No newline at end of file
+respond with a brief 2-3 sentence appraisal of your portfolio and its outlook.
+{current_state(account)}"""
\ No newline at end of file
@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import accounts
+import database
+from account_summary import summarize_account
+from accounts import COST_BASIS_METHOD, Account
+from positions import Ledger
+
+
+class AccountTestCase(unittest.TestCase):
+    """Accounts in a temporary database, with every share priced at 100"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db = patch.object(database, "DB", os.path.join(self.tmp.name, "accounts.db"))
+        prices = patch.object(accounts, "get_share_prices", lambda symbols: {symbol: 100.0 for symbol in symbols})
+        self.write_log = patch.object(accounts, "write_log").start()
+        for patcher in (db, prices):
+            patcher.start()
+        self.addCleanup(patch.stopall)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(database.close_connections)
+
+
+class TestAccountVersion(AccountTestCase):
+    def assert_no_retries(self):
+        conflicts = [call for call in self.write_log.call_args_list if "conflicted" in call.args[2]]
+        self.assertEqual(conflicts, [])
+
+    def test_trade_after_report_does_not_retry(self):
+        account = Account.get("warren")
+        account.report()
+        account.buy_shares("AAPL", 5, "Test")
+        account.sell_shares("AAPL", 2, "Test")
+        self.assert_no_retries()
+        self.assertEqual(account.holdings, {"AAPL": 3})
+
+    def test_trade_after_reset_and_strategy_change_does_not_retry(self):
+        account = Account.get("warren")
+        account.reset("Value investing")
+        account.change_strategy("Momentum trading")
+        account.buy_shares("AAPL", 5, "Test")
+        self.assert_no_retries()
+        self.assertEqual(database.read_account("warren")["holdings"], {"AAPL": 5})
+
+    def test_change_by_someone_else_is_still_caught(self):
+        account = Account.get("warren")
+        other = Account.get("warren")
+        other.buy_shares("AAPL", 5, "Test")
+        account.report()
+        account.buy_shares("MSFT", 5, "Test")
+        conflicts = [call for call in self.write_log.call_args_list if "conflicted" in call.args[2]]
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(account.holdings, {"AAPL": 5, "MSFT": 5})
+
+
+class TestAccountReport(AccountTestCase):
+    def test_report_includes_positions(self):
+        account = Account.get("warren")
+        account.buy_shares("AAPL", 5, "Test")
+        report = json.loads(account.report())
+        position = report["positions"]["AAPL"]
+        self.assertEqual(position["quantity"], 5)
+        self.assertAlmostEqual(position["average_cost"], 100.2)
+        self.assertAlmostEqual(position["market_value"], 500.0)
+        self.assertAlmostEqual(position["unrealized_profit_loss"], -1.0)
+
+
+class TestAccountSummary(AccountTestCase):
+    def test_summary_matches_replaying_the_transactions(self):
+        account = Account.get("warren")
+        account.buy_shares("AAPL", 5, "Test")
+        account.buy_shares("MSFT", 4, "Test")
+        account.sell_shares("MSFT", 4, "Test")
+        account.sell_shares("AAPL", 2, "Test")
+        summary = json.loads(summarize_account(json.loads(account.report())))
+        ledger = Ledger(COST_BASIS_METHOD)
+        for transaction in account.transactions:
+            ledger.apply(transaction.symbol, transaction.quantity, transaction.price)
+        aapl = ledger.positions["AAPL"]
+        self.assertEqual(
+            summary["holdings"],
+            [
+                {
+                    "symbol": "AAPL",
+                    "quantity": 3,
+                    "average_cost": round(aapl.average_cost, 2),
+                    "cost_basis": round(aapl.cost_basis, 2),
+                }
+            ],
+        )
+        self.assertAlmostEqual(summary["trading_stats"]["realized_profit_loss"], round(ledger.realized_profit_loss(), 2))
+        self.assertLess(summary["trading_stats"]["realized_profit_loss"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from collections import defaultdict
+from unittest.mock import patch
+
+import database
+
+LEGACY_ACCOUNT = {
+    "name": "warren",
+    "balance": 9_000.0,
+    "strategy": "Value investing",
+    "holdings": {"AAPL": 5, "MSFT": 2},
+    "transactions": [
+        {"symbol": "AAPL", "quantity": 5, "price": 150.0, "timestamp": "2025-01-02 10:00:00", "rationale": "Cheap"},
+        {"symbol": "MSFT", "quantity": 2, "price": 400.0, "timestamp": "2025-01-03 10:00:00", "rationale": "Cloud"},
+    ],
+    "portfolio_value_time_series": [["2025-01-02 10:00:00", 10_000.0], ["2025-01-03 10:00:00", 10_050.0]],
+}
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """A temporary accounts.db"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "accounts.db")
+        patch.object(database, "DB", self.db).start()
+        self.addCleanup(patch.stopall)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(database.close_connections)
+
+
+class TestMigrateLegacyAccounts(DatabaseTestCase):
+    def write_legacy_account(self, account: dict) -> None:
+        """Store an account the way the original code did, as one JSON blob in the accounts table"""
+        with sqlite3.connect(self.db) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS accounts (name TEXT PRIMARY KEY, account TEXT)")
+            conn.execute("INSERT INTO accounts (name, account) VALUES (?, ?)", (account["name"], json.dumps(account)))
+        conn.close()
+
+    def test_legacy_account_is_migrated(self):
+        self.write_legacy_account(LEGACY_ACCOUNT)
+        account = database.read_account("warren")
+        self.assertEqual(account["balance"], LEGACY_ACCOUNT["balance"])
+        self.assertEqual(account["strategy"], LEGACY_ACCOUNT["strategy"])
+        self.assertEqual(account["holdings"], LEGACY_ACCOUNT["holdings"])
+        self.assertEqual(account["transactions"], LEGACY_ACCOUNT["transactions"])
+        self.assertEqual(
+            database.read_portfolio_values("warren"),
+            [tuple(point) for point in LEGACY_ACCOUNT["portfolio_value_time_series"]],
+        )
+        self.assertEqual(database.count_portfolio_values("warren", "day"), 2)
+
+    def test_migration_runs_once(self):
+        self.write_legacy_account(LEGACY_ACCOUNT)
+        database.read_account("warren")
+        database.write_strategy("warren", "Momentum trading")
+        database.close_connections()
+        account = database.read_account("warren")
+        self.assertEqual(account["strategy"], "Momentum trading")
+        self.assertEqual(len(account["transactions"]), 2)
+        self.assertEqual(len(database.read_portfolio_values("warren")), 2)
+
+
+class TestBackfillRollups(DatabaseTestCase):
+    def write_raw_values(self, values: list[tuple[str, str, float]]) -> None:
+        """Store raw portfolio values as they were before the rollups table existed"""
+        with sqlite3.connect(self.db) as conn:
+            conn.execute(
+                "CREATE TABLE portfolio_values (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, datetime TEXT, value REAL)"
+            )
+            conn.executemany("INSERT INTO portfolio_values (name, datetime, value) VALUES (?, ?, ?)", values)
+        conn.close()
+
+    @staticmethod
+    def expected_rollups(values: list[tuple[str, float]], bucket) -> list[tuple[str, float, float, float, float]]:
+        buckets = defaultdict(list)
+        for when, value in values:
+            buckets[bucket(when)].append(value)
+        return [
+            (key, points[0], min(points), max(points), points[-1]) for key, points in sorted(buckets.items())
+        ]
+
+    def test_rollups_match_raw_values(self):
+        values = [
+            (f"2025-01-{day:02d} {hour:02d}:{minute:02d}:{second:02d}", 10_000 + (day * 7 + hour * 3 + minute) % 23)
+            for day in (2, 3)
+            for hour in (9, 10, 11)
+            for minute in (0, 1, 30)
+            for second in (0, 30)
+        ]
+        self.write_raw_values([("warren", when, value) for when, value in values] + [("cathie", values[0][0], 1.0)])
+        for resolution, bucket in database.ROLLUP_RESOLUTIONS.items():
+            self.assertEqual(
+                database.read_portfolio_value_rollups("warren", resolution), self.expected_rollups(values, bucket)
+            )
+        self.assertEqual(database.count_portfolio_values("cathie", "minute"), 1)
+
+    def test_backfill_runs_once(self):
+        self.write_raw_values([("warren", "2025-01-02 10:00:00", 10_000.0)])
+        database.write_portfolio_value("warren", "2025-01-02 10:00:30", 10_010.0)
+        database.close_connections()
+        self.assertEqual(
+            database.read_portfolio_value_rollups("warren", "minute"),
+            [("2025-01-02 10:00", 10_000.0, 10_000.0, 10_010.0, 10_010.0)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+import llm_dispatch
+from llm_dispatch import ProviderLimiter, RateLimitedTransport
+
+USAGE = {"prompt_tokens": 30, "completion_tokens": 10}
+
+
+class FakeTransport(httpx.AsyncBaseTransport):
+    """Answers with the given responses in turn, raising any that are exceptions"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = 0
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def rate_limited() -> httpx.Response:
+    return httpx.Response(429, headers={"Retry-After": "0"}, content=b"{}")
+
+
+def ok() -> httpx.Response:
+    return httpx.Response(200, content=json.dumps({"usage": USAGE}).encode())
+
+
+class TestRateLimitedTransport(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.limiter = ProviderLimiter("test", requests_per_minute=60, tokens_per_minute=6000, max_concurrency=2)
+        self.request = httpx.Request("POST", "https://example.com/v1/chat/completions", content=b"x" * 400)
+
+    async def send(self, responses):
+        inner = FakeTransport(responses)
+        transport = RateLimitedTransport(self.limiter, inner)
+        return inner, await transport.handle_async_request(self.request)
+
+    def assert_budget_used(self, requests: float, tokens: float):
+        self.assertAlmostEqual(self.limiter.requests.capacity - self.limiter.requests.tokens, requests, delta=0.1)
+        self.assertAlmostEqual(self.limiter.tokens.capacity - self.limiter.tokens.tokens, tokens, delta=1)
+
+    async def test_retries_take_budget_once(self):
+        inner, response = await self.send([rate_limited(), rate_limited(), ok()])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(inner.requests, 3)
+        self.assertEqual(self.limiter.stats.rate_limited, 2)
+        self.assertEqual(self.limiter.stats.retries, 2)
+        self.assert_budget_used(requests=1, tokens=sum(USAGE.values()))
+
+    async def test_estimate_refunded_when_retries_run_out(self):
+        responses = [rate_limited() for _ in range(llm_dispatch.MAX_RETRIES + 1)]
+        inner, response = await self.send(responses)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(inner.requests, llm_dispatch.MAX_RETRIES + 1)
+        self.assert_budget_used(requests=1, tokens=0)
+
+    async def test_estimate_refunded_after_transport_errors(self):
+        inner = FakeTransport([httpx.ConnectError("down"), httpx.ConnectError("down")])
+        transport = RateLimitedTransport(self.limiter, inner)
+        with patch.object(llm_dispatch, "MAX_RETRIES", 1), patch.object(llm_dispatch, "backoff", lambda attempt: 0):
+            with self.assertRaises(httpx.ConnectError):
+                await transport.handle_async_request(self.request)
+        self.assertEqual(self.limiter.stats.failures, 2)
+        self.assertEqual(self.limiter.semaphore._value, 2)
+        self.assert_budget_used(requests=1, tokens=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
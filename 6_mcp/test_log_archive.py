@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import database
+from log_archive import compact_logs, read_archived_logs
+
+READ_ALL_LOGS_SQL = "SELECT id, datetime, type, message FROM logs WHERE name = ? ORDER BY id"
+
+
+def days_ago(days: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class TestCompactLogs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archive_dir = os.path.join(self.tmp.name, "logs_archive")
+        patch.object(database, "DB", os.path.join(self.tmp.name, "accounts.db")).start()
+        self.addCleanup(patch.stopall)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(database.close_connections)
+
+    def read_logs(self, name: str) -> list[tuple]:
+        return database.get_connection().execute(READ_ALL_LOGS_SQL, (name,)).fetchall()
+
+    def compact_and_check(self, names: list[str], **policy) -> dict[str, int]:
+        """Compact the logs, checking each name's archive holds exactly the rows that were deleted"""
+        before = {name: self.read_logs(name) for name in names}
+        archived = compact_logs(archive_dir=self.archive_dir, batch_size=3, **policy)
+        for name in names:
+            after = self.read_logs(name)
+            deleted = [row for row in before[name] if row not in after]
+            self.assertEqual(list(read_archived_logs(name, self.archive_dir)), deleted)
+            self.assertEqual(archived.get(name, 0), len(deleted))
+            self.assertEqual(before[name], deleted + after)
+        return archived
+
+    def test_expired_entries_are_archived(self):
+        entries = [("warren", days_ago(12.5 - n), "trace", f"Old entry {n}") for n in range(8)]
+        entries += [("warren", days_ago(1), "trace", f"New entry {n}") for n in range(4)]
+        entries += [("cathie", days_ago(1), "agent", f"New entry {n}") for n in range(4)]
+        database.write_logs(entries)
+        archived = self.compact_and_check(["warren", "cathie"], retention_days=7, retention_rows=0)
+        self.assertEqual(archived, {"warren": 6})
+        self.assertEqual(len(self.read_logs("warren")), 6)
+
+    def test_entries_beyond_the_newest_rows_are_archived(self):
+        database.write_logs([("warren", days_ago(1), "trace", f"Entry {n}") for n in range(10)])
+        archived = self.compact_and_check(["warren"], retention_days=0, retention_rows=4)
+        self.assertEqual(archived, {"warren": 6})
+        self.assertEqual([row[3] for row in self.read_logs("warren")], [f"Entry {n}" for n in range(6, 10)])
+
+    def test_compacting_again_appends_to_the_archive(self):
+        database.write_logs([("warren", days_ago(1), "trace", f"Entry {n}") for n in range(5)])
+        self.compact_and_check(["warren"], retention_days=0, retention_rows=2)
+        database.write_logs([("warren", days_ago(1), "trace", f"Entry {n}") for n in range(5, 8)])
+        archived = compact_logs(retention_days=0, retention_rows=2, archive_dir=self.archive_dir, batch_size=3)
+        self.assertEqual(archived, {"warren": 3})
+        archive = [row[3] for row in read_archived_logs("warren", self.archive_dir)]
+        self.assertEqual(archive, [f"Entry {n}" for n in range(6)])
+
+
+if __name__ == "__main__":
+    unittest.main()
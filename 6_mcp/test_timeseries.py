@@ -0,0 +1,78 @@
+import math
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import database
+import timeseries
+from timeseries import get_portfolio_value_series, lttb, min_max
+
+
+def wave(count: int) -> list[tuple[str, float]]:
+    """A portfolio value a minute, wandering up and down, starting on 2 January 2025"""
+    points = []
+    for minute in range(count):
+        day, rest = divmod(minute, 24 * 60)
+        when = f"2025-01-{day + 2:02d} {rest // 60:02d}:{rest % 60:02d}:00"
+        points.append((when, 10_000 + 500 * math.sin(minute / 37) + 120 * math.sin(minute / 5)))
+    return points
+
+
+class TestDownsampling(unittest.TestCase):
+    def test_lttb_keeps_endpoints_and_point_count(self):
+        points = wave(1000)
+        for threshold in (3, 10, 99, 500):
+            sampled = lttb(points, threshold)
+            self.assertEqual(len(sampled), threshold)
+            self.assertEqual(sampled[0], points[0])
+            self.assertEqual(sampled[-1], points[-1])
+            self.assertEqual(sampled, sorted(sampled))
+
+    def test_lttb_leaves_short_series_alone(self):
+        points = wave(10)
+        self.assertEqual(lttb(points, 10), points)
+        self.assertEqual(lttb(points, 50), points)
+
+    def test_min_max_keeps_extremes_in_order(self):
+        points = wave(1000)
+        sampled = min_max(points, 100)
+        self.assertLessEqual(len(sampled), 100)
+        self.assertEqual(sampled, sorted(sampled))
+        self.assertTrue(set(sampled) <= set(points))
+        self.assertIn(min(points, key=lambda point: point[1]), sampled)
+        self.assertIn(max(points, key=lambda point: point[1]), sampled)
+
+
+class TestPortfolioValueSeries(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patch.object(database, "DB", os.path.join(self.tmp.name, "accounts.db")).start()
+        self.read_rollups = patch.object(
+            timeseries, "read_portfolio_value_rollups", wraps=database.read_portfolio_value_rollups
+        ).start()
+        self.addCleanup(patch.stopall)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(database.close_connections)
+
+    def write_values(self, points: list[tuple[str, float]]) -> None:
+        account = {"balance": 10_000.0, "strategy": "", "holdings": {}, "transactions": []}
+        database.write_account("warren", {**account, "portfolio_value_time_series": points})
+
+    def test_short_history_is_read_raw(self):
+        points = wave(30)
+        self.write_values(points)
+        self.assertEqual(get_portfolio_value_series("warren", max_points=10, method=lambda p, n: p), points)
+        self.read_rollups.assert_not_called()
+
+    def test_finest_rollup_that_fits_is_used(self):
+        self.write_values(wave(3 * 24 * 60))
+        # 4,320 raw values and minutes, 72 hours and 3 days, against a limit of 4 times the points
+        for max_points, resolution in ((20, "hour"), (10, "day")):
+            series = get_portfolio_value_series("warren", max_points=max_points)
+            self.assertLessEqual(len(series), max_points)
+            self.assertEqual(self.read_rollups.call_args.args, ("warren", resolution))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+from database import count_portfolio_values, read_portfolio_values, read_portfolio_value_rollups
+
+# Charts never need more points than this, however long the history
+CHART_POINTS = 500
+
+# Coarsest last: the finest resolution that fits within a few times the chart points is used
+RESOLUTIONS = ["minute", "hour", "day"]
+OVERSAMPLE = 4
+
+
+def lttb(points: list[tuple[str, float]], threshold: int) -> list[tuple[str, float]]:
+    """
+    Largest-Triangle-Three-Buckets downsampling: keeps the first and last points, and from each bucket
+    in between the point forming the largest triangle with its neighbours, preserving the visual shape.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        following = points[end:next_end] or [points[-1]]
+        avg_x = sum(range(end, end + len(following))) / len(following)
+        avg_y = sum(value for _, value in following) / len(following)
+        ax, ay = a, points[a][1]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def min_max(points: list[tuple[str, float]], threshold: int) -> list[tuple[str, float]]:
+    """Keep the lowest and highest point of each bucket, in time order, so no peak or trough is lost"""
+    if threshold >= len(points) or threshold < 2:
+        return list(points)
+    buckets = threshold // 2
+    every = len(points) / buckets
+    sampled = []
+    for i in range(buckets):
+        bucket = points[int(i * every):int((i + 1) * every)]
+        if not bucket:
+            continue
+        low = min(range(len(bucket)), key=lambda j: bucket[j][1])
+        high = max(range(len(bucket)), key=lambda j: bucket[j][1])
+        sampled.extend(bucket[j] for j in sorted({low, high}))
+    return sampled
+
+
+def rollup_points(rows: list[tuple]) -> list[tuple[str, float]]:
+    """Chart each (bucket, first, min, max, last) rollup by its low and high, ordered as they occurred"""
+    points = []
+    for bucket, first, low, high, last in rows:
+        if low == high:
+            points.append((bucket, last))
+        elif first <= last:
+            points.extend([(bucket, low), (bucket, high)])
+        else:
+            points.extend([(bucket, high), (bucket, low)])
+    return points
+
+
+def get_portfolio_value_series(name: str, max_points: int = CHART_POINTS, method=lttb) -> list[tuple[str, float]]:
+    """
+    The portfolio value history of an account, at most max_points long, for charting.
+    Short histories are read raw; longer ones from the finest rollup that keeps the rows read bounded.
+    """
+    if count_portfolio_values(name) <= max_points * OVERSAMPLE:
+        points = read_portfolio_values(name)
+    else:
+        for resolution in RESOLUTIONS:
+            if count_portfolio_values(name, resolution) <= max_points * OVERSAMPLE:
+                break
+        points = rollup_points(read_portfolio_value_rollups(name, resolution))
+    return method(points, max_points)
@@ -1,10 +1,32 @@
 from agents import TracingProcessor, Trace, Span
-from database import write_log
+from agents.tracing import get_current_span, AgentSpanData, FunctionSpanData, GenerationSpanData, ResponseSpanData
+from database import write_logs, write_metrics
+from llm_dispatch import usage_listeners, get_cached_tokens
+from datetime import datetime, timezone
+import queue
+import threading
+import time
 import secrets
 import string
 
 ALPHANUM = string.ascii_lowercase + string.digits 
 
+# The log writer flushes when this many entries are waiting, or when the oldest has waited this long
+LOG_BATCH_SIZE = 100
+LOG_FLUSH_SECONDS = 0.5
+
+# Approximate list prices in USD per million tokens as (input, cached input, output); the longest name
+# contained in a model's name is used, and models not listed are recorded with no cost
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "deepseek-chat": (0.27, 0.07, 1.10),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+    "grok-3-mini": (0.30, 0.075, 0.50),
+}
+
 def make_trace_id(tag: str) -> str:
     """
     Return a string of the form 'trace_<tag><random>',
@@ -15,25 +37,111 @@ def make_trace_id(tag: str) -> str:
     random_suffix = ''.join(secrets.choice(ALPHANUM) for _ in range(pad_len))
     return f"trace_{tag}{random_suffix}"
 
+def get_trader_name(trace_id: str) -> str | None:
+    """The tag a trace id was made with by make_trace_id, which for a trader's run is its name"""
+    name = trace_id.split("_")[1]
+    if '0' in name:
+        return name.split("0")[0]
+    else:
+        return None
+
+def get_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int) -> float:
+    """The cost in USD of a model call, with cached tokens counted among the input tokens"""
+    matches = [key for key in MODEL_PRICES if key in model]
+    if not matches:
+        return 0.0
+    input_price, cached_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    uncached = input_tokens - cached_tokens
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+class BufferedLogWriter:
+    """
+    Collects log entries in memory and writes them to the logs table from a background thread,
+    so that recording a span never blocks the event loop on a SQLite insert and commit.
+    Entries are written in batches with a single executemany per transaction.
+    """
+
+    def __init__(
+        self, batch_size: int = LOG_BATCH_SIZE, flush_seconds: float = LOG_FLUSH_SECONDS, sink=write_logs
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, name: str, type: str, message: str) -> None:
+        self.put((name, self.now(), type, message))
+
+    def put(self, entry) -> None:
+        """Queue an entry for the sink, which is given a list of them at a time"""
+        if self.stopped.is_set():
+            self.sink([entry])
+        else:
+            self.queue.put(entry)
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    def run(self) -> None:
+        while not (self.stopped.is_set() and self.queue.empty()):
+            batch = []
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.write_batch(batch)
+
+    def write_batch(self, batch: list) -> None:
+        if not batch:
+            return
+        try:
+            self.sink(batch)
+        except Exception as e:
+            print(f"Failed to write {len(batch)} entries: {e}")
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def flush(self) -> None:
+        """Block until everything queued so far has been written"""
+        self.queue.join()
+
+    def close(self) -> None:
+        """Write out anything still queued and stop the background thread"""
+        self.stopped.set()
+        self.thread.join()
+        leftovers = []
+        while not self.queue.empty():
+            leftovers.append(self.queue.get_nowait())
+        self.write_batch(leftovers)
+
+
 class LogTracer(TracingProcessor):
 
+    def __init__(self, writer: BufferedLogWriter | None = None):
+        self.writer = writer or BufferedLogWriter()
+
     def get_name(self, trace_or_span: Trace | Span) -> str | None:
-        trace_id = trace_or_span.trace_id
-        name = trace_id.split("_")[1]
-        if '0' in name:
-            return name.split("0")[0]
-        else:
-            return None
+        return get_trader_name(trace_or_span.trace_id)
 
     def on_trace_start(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Started: {trace.name}")
+            self.writer.write(name, "trace", f"Started: {trace.name}")
 
     def on_trace_end(self, trace) -> None:
         name = self.get_name(trace)
         if name:
-            write_log(name, "trace", f"Ended: {trace.name}")
+            self.writer.write(name, "trace", f"Ended: {trace.name}")
 
     def on_span_start(self, span) -> None:
         name = self.get_name(span)
@@ -49,7 +157,7 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.writer.write(name, type, message)
 
     def on_span_end(self, span) -> None:
         name = self.get_name(span)
@@ -66,10 +174,111 @@ class LogTracer(TracingProcessor):
                     message += f" {span.span_data.server}"
             if span.error:
                 message += f" {span.error}"
-            write_log(name, type, message)
+            self.writer.write(name, type, message)
+
+    def force_flush(self) -> None:
+        self.writer.flush()
+
+    def shutdown(self) -> None:
+        self.writer.close()
+
+
+def write_metric_entries(entries: list[tuple[str, tuple]]) -> None:
+    spans = [values for kind, values in entries if kind == "span"]
+    cycles = [values for kind, values in entries if kind == "cycle"]
+    write_metrics(spans, cycles)
+
+
+class MetricsTracer(TracingProcessor):
+    """
+    Records the model, latency, tokens and cost of each model call, and each tool call, in the
+    span_metrics table; when a trace ends, its spans are rolled up into one cycle in cycle_metrics.
+    A trader's runs are recorded under the trader's name, and any other trace under its workflow name.
+
+    The chat completions spans only carry input and output tokens, so the cached prompt tokens are
+    picked up from each response's usage as it passes through llm_dispatch, while its span is current.
+    They are kept per trace until the span ends, and any left over, from spans that never ended,
+    are dropped with the trace.
+    """
+
+    def __init__(self, writer: BufferedLogWriter | None = None):
+        self.writer = writer or BufferedLogWriter(sink=write_metric_entries)
+        self.traces: dict[str, tuple[str, str, str, float]] = {}
+        self.agents: dict[str, dict[str, str]] = {}
+        self.cached_tokens: dict[str, dict[str, int]] = {}
+        usage_listeners.append(self.on_usage)
+
+    def on_usage(self, usage: dict) -> None:
+        span = get_current_span()
+        if span is None or not isinstance(span.span_data, GenerationSpanData):
+            return
+        if span.trace_id in self.cached_tokens:
+            self.cached_tokens[span.trace_id][span.span_id] = get_cached_tokens(usage)
+
+    def on_trace_start(self, trace) -> None:
+        # A trader's traces are named after it, e.g. warren-trading; other trace ids are random
+        tag = get_trader_name(trace.trace_id)
+        name = tag if tag and trace.name.lower().startswith(tag) else trace.name
+        self.traces[trace.trace_id] = (name, trace.name, BufferedLogWriter.now(), time.monotonic())
+        self.agents[trace.trace_id] = {}
+        self.cached_tokens[trace.trace_id] = {}
+
+    def on_trace_end(self, trace) -> None:
+        self.agents.pop(trace.trace_id, None)
+        self.cached_tokens.pop(trace.trace_id, None)
+        if trace.trace_id not in self.traces:
+            return
+        name, workflow, started, start = self.traces.pop(trace.trace_id)
+        self.writer.put(("cycle", (trace.trace_id, name, workflow, started, time.monotonic() - start)))
+
+    def on_span_start(self, span) -> None:
+        if isinstance(span.span_data, AgentSpanData) and span.trace_id in self.agents:
+            self.agents[span.trace_id][span.span_id] = span.span_data.name
+
+    @staticmethod
+    def get_timing(span) -> tuple[str | None, float | None]:
+        if not span.started_at:
+            return None, None
+        started = datetime.fromisoformat(span.started_at)
+        latency = (datetime.fromisoformat(span.ended_at) - started).total_seconds() if span.ended_at else None
+        return started.strftime("%Y-%m-%d %H:%M:%S"), latency
+
+    @staticmethod
+    def get_usage(data) -> tuple[str, int, int, int | None]:
+        """The model, input tokens, output tokens and cached tokens, if known, of a model call span"""
+        if isinstance(data, GenerationSpanData):
+            usage = data.usage or {}
+            return data.model or "unknown", usage.get("input_tokens", 0), usage.get("output_tokens", 0), None
+        response = data.response
+        usage = response.usage if response else None
+        if usage is None:
+            return response.model if response else "unknown", 0, 0, 0
+        return response.model, usage.input_tokens, usage.output_tokens, usage.input_tokens_details.cached_tokens
+
+    def on_span_end(self, span) -> None:
+        data = span.span_data
+        if span.trace_id not in self.traces or not isinstance(
+            data, (GenerationSpanData, ResponseSpanData, FunctionSpanData)
+        ):
+            return
+        name = self.traces[span.trace_id][0]
+        agent = self.agents.get(span.trace_id, {}).get(span.parent_id)
+        started, latency = self.get_timing(span)
+        error = span.error["message"] if span.error else None
+        row = (name, span.trace_id, data.type, agent)
+        if isinstance(data, FunctionSpanData):
+            self.writer.put(("span", (*row, None, data.name, started, latency, None, None, None, None, error)))
+            return
+        model, input_tokens, output_tokens, cached_tokens = self.get_usage(data)
+        cached = self.cached_tokens.get(span.trace_id, {}).pop(span.span_id, 0)
+        if cached_tokens is None:
+            cached_tokens = cached
+        cost = get_cost(model, input_tokens, output_tokens, cached_tokens)
+        measures = (input_tokens, output_tokens, cached_tokens, cost, error)
+        self.writer.put(("span", (*row, model, None, started, latency, *measures)))
 
     def force_flush(self) -> None:
-        pass
+        self.writer.flush()
 
     def shutdown(self) -> None:
-        pass
\ No newline at end of file
+        self.writer.close()
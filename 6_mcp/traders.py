@@ -1,8 +1,9 @@
 from contextlib import AsyncExitStack
 from accounts_client import read_accounts_resource, read_strategy_resource
 from tracers import make_trace_id
-from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, trace
-from openai import AsyncOpenAI
+from agents import Agent, Tool, Runner, OpenAIChatCompletionsModel, ModelSettings, trace, set_default_openai_client
+from agents import set_default_openai_api
+from llm_dispatch import make_client
 from dotenv import load_dotenv
 import os
 import json
@@ -15,6 +16,9 @@ from templates import (
     research_tool,
 )
 from mcp_params import trader_mcp_server_params, researcher_mcp_server_params
+from mcp_pool import MCPServerPool
+from stub_model import StubModel
+from account_summary import summarize_account
 
 load_dotenv(override=True)
 
@@ -23,6 +27,9 @@ google_api_key = os.getenv("GOOGLE_API_KEY")
 grok_api_key = os.getenv("GROK_API_KEY")
 openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
 
+# Point every trader at a local mock_llm.py server, e.g. http://localhost:8765/v1, for offline load tests
+mock_llm_url = os.getenv("MOCK_LLM_URL")
+
 DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
 GROK_BASE_URL = "https://api.x.ai/v1"
 GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
@@ -30,14 +37,29 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 MAX_TURNS = 30
 
-openrouter_client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=openrouter_api_key)
-deepseek_client = AsyncOpenAI(base_url=DEEPSEEK_BASE_URL, api_key=deepseek_api_key)
-grok_client = AsyncOpenAI(base_url=GROK_BASE_URL, api_key=grok_api_key)
-gemini_client = AsyncOpenAI(base_url=GEMINI_BASE_URL, api_key=google_api_key)
+# OpenAI models, which take a prompt_cache_key to keep requests that share a prefix on the same cache
+OPENAI_MODEL_PREFIXES = ("gpt-", "o1", "o3", "o4")
+
+# One rate limited, connection pooled client per provider, shared by all the traders
+openai_client = make_client("openai")
+openrouter_client = make_client("openrouter", OPENROUTER_BASE_URL, openrouter_api_key)
+deepseek_client = make_client("deepseek", DEEPSEEK_BASE_URL, deepseek_api_key)
+grok_client = make_client("grok", GROK_BASE_URL, grok_api_key)
+gemini_client = make_client("gemini", GEMINI_BASE_URL, google_api_key)
+mock_client = make_client("mock", mock_llm_url, "mock") if mock_llm_url else None
+set_default_openai_client(openai_client, use_for_tracing=False)
+if mock_client:
+    # The mock only serves the Chat Completions API, so agents left on the default model must use it too
+    set_default_openai_client(mock_client, use_for_tracing=False)
+    set_default_openai_api("chat_completions")
 
 
 def get_model(model_name: str):
-    if "/" in model_name:
+    if model_name == "stub":
+        return StubModel()
+    elif mock_client:
+        return OpenAIChatCompletionsModel(model=model_name, openai_client=mock_client)
+    elif "/" in model_name:
         return OpenAIChatCompletionsModel(model=model_name, openai_client=openrouter_client)
     elif "deepseek" in model_name:
         return OpenAIChatCompletionsModel(model=model_name, openai_client=deepseek_client)
@@ -49,11 +71,18 @@ def get_model(model_name: str):
         return model_name
 
 
+def get_model_settings(model_name: str, cache_key: str) -> ModelSettings:
+    if model_name.startswith(OPENAI_MODEL_PREFIXES) and not mock_client:
+        return ModelSettings(extra_args={"prompt_cache_key": cache_key})
+    return ModelSettings()
+
+
 async def get_researcher(mcp_servers, model_name) -> Agent:
     researcher = Agent(
         name="Researcher",
         instructions=researcher_instructions(),
         model=get_model(model_name),
+        model_settings=get_model_settings(model_name, "researcher"),
         mcp_servers=mcp_servers,
     )
     return researcher
@@ -78,6 +107,7 @@ class Trader:
             name=self.name,
             instructions=trader_instructions(self.name),
             model=get_model(self.model_name),
+            model_settings=get_model_settings(self.model_name, f"trader-{self.name.lower()}"),
             tools=[tool],
             mcp_servers=trader_mcp_servers,
         )
@@ -85,9 +115,7 @@ class Trader:
 
     async def get_account_report(self) -> str:
         account = await read_accounts_resource(self.name)
-        account_json = json.loads(account)
-        account_json.pop("portfolio_value_time_series", None)
-        return json.dumps(account_json)
+        return summarize_account(json.loads(account))
 
     async def run_agent(self, trader_mcp_servers, researcher_mcp_servers):
         self.agent = await self.create_agent(trader_mcp_servers, researcher_mcp_servers)
@@ -117,15 +145,21 @@ class Trader:
                 ]
                 await self.run_agent(trader_mcp_servers, researcher_mcp_servers)
 
-    async def run_with_trace(self):
+    async def run_with_mcp_pool(self, mcp_pool: MCPServerPool):
+        await self.run_agent(mcp_pool.get_trader_servers(), mcp_pool.get_researcher_servers(self.name))
+
+    async def run_with_trace(self, mcp_pool: MCPServerPool | None = None):
         trace_name = f"{self.name}-trading" if self.do_trade else f"{self.name}-rebalancing"
         trace_id = make_trace_id(f"{self.name.lower()}")
         with trace(trace_name, trace_id=trace_id):
-            await self.run_with_mcp_servers()
+            if mcp_pool:
+                await self.run_with_mcp_pool(mcp_pool)
+            else:
+                await self.run_with_mcp_servers()
 
-    async def run(self):
+    async def run(self, mcp_pool: MCPServerPool | None = None):
         try:
-            await self.run_with_trace()
+            await self.run_with_trace(mcp_pool)
         except Exception as e:
             print(f"Error running trader {self.name}: {e}")
         self.do_trade = not self.do_trade
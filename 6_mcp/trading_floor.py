@@ -1,9 +1,16 @@
 from traders import Trader
 from typing import List
 import asyncio
-from tracers import LogTracer
-from agents import add_trace_processor
-from market import is_market_open
+from tracers import LogTracer, MetricsTracer
+from agents import add_trace_processor, set_trace_processors
+from mcp_pool import MCPServerPool
+from scheduler import TradingScheduler, Schedule
+from llm_dispatch import get_usage_stats
+from research_cache import research_cache
+from log_archive import LogCompactor
+from simulation import BACKTEST, SimulatedClock, get_historical_prices
+from backtest import Backtest
+from reset import reset_traders
 from dotenv import load_dotenv
 import os
 
@@ -14,10 +21,23 @@ RUN_EVEN_WHEN_MARKET_IS_CLOSED = (
     os.getenv("RUN_EVEN_WHEN_MARKET_IS_CLOSED", "false").strip().lower() == "true"
 )
 USE_MANY_MODELS = os.getenv("USE_MANY_MODELS", "false").strip().lower() == "true"
+RUN_TIMEOUT_MINUTES = int(os.getenv("RUN_TIMEOUT_MINUTES", str(RUN_EVERY_N_MINUTES)))
+STAGGER_SECONDS = int(os.getenv("STAGGER_SECONDS", "30"))
+
+# Backtesting: set BACKTEST=true and the date range; BACKTEST_MODEL=stub times the engine alone
+BACKTEST_START = os.getenv("BACKTEST_START", "2025-01-01")
+BACKTEST_END = os.getenv("BACKTEST_END", "2025-03-31")
+BACKTEST_MODEL = os.getenv("BACKTEST_MODEL")
+MOCK_LLM_URL = os.getenv("MOCK_LLM_URL")
 
 names = ["Warren", "George", "Ray", "Cathie"]
 lastnames = ["Patience", "Bold", "Systematic", "Crypto"]
 
+# Each trader can have its own cadence, e.g. RUN_EVERY_N_MINUTES_CATHIE=30
+run_every_n_minutes_by_trader = [
+    int(os.getenv(f"RUN_EVERY_N_MINUTES_{name.upper()}", str(RUN_EVERY_N_MINUTES))) for name in names
+]
+
 if USE_MANY_MODELS:
     model_names = [
         "gpt-4.1-mini",
@@ -30,6 +50,10 @@ else:
     model_names = ["gpt-4o-mini"] * 4
     short_model_names = ["GPT 4o mini"] * 4
 
+if BACKTEST and BACKTEST_MODEL:
+    model_names = [BACKTEST_MODEL] * 4
+    short_model_names = [BACKTEST_MODEL] * 4
+
 
 def create_traders() -> List[Trader]:
     traders = []
@@ -38,17 +62,76 @@ def create_traders() -> List[Trader]:
     return traders
 
 
+def create_schedules() -> List[Schedule]:
+    return [
+        Schedule(
+            every_seconds=minutes * 60,
+            timeout_seconds=min(minutes, RUN_TIMEOUT_MINUTES) * 60,
+            offset_seconds=index * STAGGER_SECONDS,
+        )
+        for index, minutes in enumerate(run_every_n_minutes_by_trader)
+    ]
+
+
 async def run_every_n_minutes():
-    add_trace_processor(LogTracer())
+    if MOCK_LLM_URL:
+        # Offline against the mock model server, so keep the traces local too
+        set_trace_processors([LogTracer(), MetricsTracer()])
+    else:
+        add_trace_processor(LogTracer())
+        add_trace_processor(MetricsTracer())
+    log_compactor = LogCompactor()
+    log_compactor.start()
     traders = create_traders()
-    while True:
-        if RUN_EVEN_WHEN_MARKET_IS_CLOSED or is_market_open():
-            await asyncio.gather(*[trader.run() for trader in traders])
-        else:
-            print("Market is closed, skipping run")
-        await asyncio.sleep(RUN_EVERY_N_MINUTES * 60)
+    mcp_pool = MCPServerPool(names)
+    await mcp_pool.start()
+    scheduler = TradingScheduler(
+        traders,
+        create_schedules(),
+        mcp_pool,
+        health_check_seconds=RUN_EVERY_N_MINUTES * 60,
+        run_when_market_closed=RUN_EVEN_WHEN_MARKET_IS_CLOSED,
+    )
+    try:
+        await scheduler.run()
+    finally:
+        await mcp_pool.close()
+        log_compactor.close()
+        print_llm_usage()
+        print(f"Research cache: {research_cache.get_stats()}")
+
+
+async def run_backtest():
+    # Keep the replay's traces in the backtest database rather than exporting thousands of them
+    set_trace_processors([LogTracer(), MetricsTracer()])
+    prices = get_historical_prices()
+    clock = SimulatedClock(BACKTEST_START, BACKTEST_END, prices.dates)
+    # The traders are reset at the simulated start, not at the time the last backtest ended
+    clock.rewind()
+    reset_traders()
+    backtest = Backtest(create_traders(), clock, prices)
+    try:
+        await backtest.run()
+    finally:
+        backtest.print_results()
+        print_llm_usage()
+
+
+def print_llm_usage():
+    for provider, stats in get_usage_stats().items():
+        print(
+            f"{provider}: {stats['requests']} requests, {stats['retries']} retries, "
+            f"{stats['rate_limited']} rate limited, {stats['input_tokens']:,} in / "
+            f"{stats['output_tokens']:,} out tokens, {stats['cached_tokens']:,} cached "
+            f"({stats['cache_hit_rate']:.0%} of input), {stats['mean_queue_ms']:.0f}ms mean queue, "
+            f"{stats['mean_latency_ms']:.0f}ms mean latency"
+        )
 
 
 if __name__ == "__main__":
-    print(f"Starting scheduler to run every {RUN_EVERY_N_MINUTES} minutes")
-    asyncio.run(run_every_n_minutes())
+    if BACKTEST:
+        print(f"Backtesting from {BACKTEST_START} to {BACKTEST_END}")
+        asyncio.run(run_backtest())
+    else:
+        print(f"Starting scheduler to run every {RUN_EVERY_N_MINUTES} minutes")
+        asyncio.run(run_every_n_minutes())